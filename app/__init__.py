@@ -1,5 +1,21 @@
 from flask import Flask
+import app.config as config
+from app.json_provider import JSONProvider
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
 
 from app.views import *
+from app.commands import *
+from app.metrics import init_app as init_metrics
+from app.unit_of_work import init_app as init_unit_of_work
+
+init_metrics(app)
+init_unit_of_work(app)
+
+if getattr(config, "ENSURE_INDEXES_ON_STARTUP", False):
+    from app.indexes import ensure_indexes, verify_query_plans
+
+    ensure_indexes()
+    if getattr(config, "VERIFY_QUERY_PLANS_ON_STARTUP", False):
+        verify_query_plans()
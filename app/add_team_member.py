@@ -1,46 +1,59 @@
 from app.util import return_resp
-from app.db import coll
-from app.lcs import call_auth_endpoint, get_name
-from flask import request
-from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
+from app.db import HAS_OPEN_SLOT, bump_open_teams_version, coll, versioned
+from app.recommendations import refresh_team, refresh_user
+from app.lcs import call_auth_endpoint, read_name_fields
+from app.names import name_set
+from flask import g, request
+from pymongo.errors import DuplicateKeyError
+from app.schemas import request_body, ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
 
 
-@ensure_json()
+@ensure_json("add team member")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("add team member")
 def add_member():
     if request.method == 'POST':
-        data = request.get_json(silent=True)
-        email = data['user_email']
-        email = email.strip().lower()
-        if not data or 'email' not in data or not data['email']:
-            return return_resp(400, "Required info not found")
-        partner_email = data['email'].strip().lower()
+        email = g.user_email
+        partner_email = request_body()['email'].strip().lower()
         dir_token = call_auth_endpoint()
         if dir_token == 400:
             return return_resp(401, "auth endpoint failed")
-        if get_name(dir_token, partner_email) == 400:
+        # the partner's names are stored when they join, below
+        names = read_name_fields([partner_email])
+        if names is None:
+            return return_resp(503, "LCS unavailable")
+        if partner_email not in names:
             return return_resp(402, "Partner doesn't have a hackru account")
-        team = coll("teams").find_one({"members": {"$all": [email]}})
+        team = coll("teams").find_one_and_update(
+            {"members": {"$all": [email], "$nin": [partner_email]}, **HAS_OPEN_SLOT},
+            versioned({"$push": {"members": partner_email}}),
+            projection={"_id": 1},
+        )
         if not team:
-            return return_resp(405, "User not in a team")
-        team_name = team['_id']
-        team_size = len(team['members'])
-        team_full = coll("teams").find_one({"_id": team_name, "complete": True})
-        if team_full or team_size >= 4:
-            return return_resp(403, "Team complete")
-        user_exist = coll("users").find_one({"_id": partner_email})
-        if not user_exist:
-            coll("users").insert({"_id": partner_email, "hasateam": True, "skills": [], "prizes": []})
-            coll("teams").update_one({"_id": team_name}, {"$push": {"members": partner_email}})
-            return return_resp(200, "Success")
-        else:
-            partner_in_a_team = coll("users").find_one({"_id": partner_email, "hasateam": True})
-            if not partner_in_a_team:
-                coll("users").update_one({"_id": partner_email}, {"$set": {"hasateam": True}})
-                coll("teams").update_one({"_id": team_name}, {"$push": {"members": partner_email}})
-                if team_size == 4:
-                    coll("teams").update_one({"_id": team_name}, {"$set": {"complete": True}})
-                return return_resp(200, "Success")
-            else:
+            team = coll("teams").find_one({"members": {"$all": [email]}}, {"members": 1})
+            if not team:
+                return return_resp(405, "User not in a team")
+            if partner_email in team['members']:
                 return return_resp(406, "Partner in a team")
+            return return_resp(403, "Team complete")
+        team_name = team['_id']
+        try:
+            # creates a bare profile for partners who never made one; an
+            # existing profile that already has a team fails the filter, so
+            # the upsert collides with it on _id
+            coll("users").update_one(
+                {"_id": partner_email, "hasateam": {"$ne": True}},
+                {
+                    "$set": {"hasateam": True, "team_id": team_name, **name_set(names[partner_email])},
+                    "$setOnInsert": {"skills": [], "prizes": []},
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            coll("teams").update_one({"_id": team_name}, versioned({"$pull": {"members": partner_email}}))
+            bump_open_teams_version()
+            return return_resp(406, "Partner in a team")
+        bump_open_teams_version()
+        refresh_user(partner_email)
+        refresh_team(team_name)
+        return return_resp(200, "Success")
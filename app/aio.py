@@ -0,0 +1,194 @@
+"""Async I/O for ASYNC_MODE.
+
+Each process runs one asyncio event loop in a background thread, and that
+loop owns an AsyncMongoClient and a pooled httpx.AsyncClient for LCS. Views
+stay ordinary Flask views and hand their work to run(), so the app is served
+by gunicorn exactly as before, but the independent round trips inside one
+request (token validation, Mongo reads, name lookups) overlap instead of
+running one after another.
+
+The helpers here mirror their sync counterparts in app.db, app.lcs and
+app.schemas and share their caches.
+"""
+import asyncio
+import os
+import threading
+
+import httpx
+from pymongo import AsyncMongoClient
+
+import app.config as config
+import app.lcs as lcs
+import app.schemas as schemas
+from app.db import _client_options
+from app.names import NAME_PROJECTION, stored_name
+from app.recommendations import fresh_matches
+
+_loop = None
+_loop_pid = None
+_lock = threading.Lock()
+_mongo = None
+_http = None
+_collections = {}
+# (email, token) -> future of an LCS /validate call already in flight
+_validating = {}
+
+
+def _start_loop():
+    global _loop, _loop_pid, _mongo, _http
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="teamru-aio", daemon=True).start()
+    _collections.clear()
+    _validating.clear()
+    _mongo = None
+    _http = None
+    _loop = loop
+    _loop_pid = os.getpid()
+
+
+def run(coro):
+    """Run coro on this process's event loop and return its result."""
+    pid = os.getpid()
+    if _loop is None or _loop_pid != pid:
+        with _lock:
+            if _loop is None or _loop_pid != pid:
+                _start_loop()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+def acoll(coll_name):
+    """Async counterpart of app.db.coll; only usable on the event loop."""
+    global _mongo
+    if _mongo is None:
+        _mongo = AsyncMongoClient(config.DB_URI, **_client_options())
+    collection = _collections.get(coll_name)
+    if collection is None:
+        collection = _mongo.get_database()[config.DB_COLLECTIONS.get(coll_name, coll_name)]
+        _collections[coll_name] = collection
+    return collection
+
+
+def _http_client():
+    global _http
+    if _http is None:
+        pool_size = getattr(config, "LCS_POOL_SIZE", 20)
+        _http = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                getattr(config, "LCS_READ_TIMEOUT", 10),
+                connect=getattr(config, "LCS_CONNECT_TIMEOUT", 3.05),
+            ),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+    return _http
+
+
+async def lcs_post(path, data_dic, idempotent=False):
+    """Async lcs.client.post: same timeouts, retries, circuit breaker and
+    metrics."""
+    for delay in lcs.retry_delays(idempotent):
+        if delay:
+            await asyncio.sleep(delay)
+        start = lcs.begin_attempt(path)
+        if start is None:
+            return None
+        try:
+            resp = await _http_client().post(config.LCS_BASE_URL + path, json=data_dic)
+        except httpx.HTTPError:
+            lcs.attempt_failed(path, start)
+            continue
+        except BaseException:
+            # cancelled; don't leave a half-open probe unaccounted for
+            lcs.attempt_failed(path, start, outcome=None)
+            raise
+        if lcs.attempt_answered(path, start, resp.status_code):
+            return lcs.parse_response(resp)
+    return None
+
+
+async def validate_user(email, token):
+    """Async schemas.validate_user, sharing its cache."""
+    key = (email, token)
+    result = schemas.validation_cache.get(key, lcs._NOT_CACHED)
+    if result is not lcs._NOT_CACHED:
+        return schemas.session_result(key, result)
+    pending = _validating.get(key)
+    if pending is not None:
+        return schemas.session_result(key, await asyncio.shield(pending))
+    pending = asyncio.get_running_loop().create_future()
+    _validating[key] = pending
+    try:
+        resp_parsed = await lcs_post("/validate", {"email": email, "token": token}, idempotent=True)
+        result = lcs.validate_result(resp_parsed)
+        schemas.cache_validation(key, result)
+        pending.set_result(result)
+    except BaseException as e:
+        pending.set_exception(e)
+        raise
+    finally:
+        del _validating[key]
+    return schemas.session_result(key, result)
+
+
+async def _director_token():
+    # usually a cached value; a refresh blocks, so keep it off the loop
+    return await asyncio.to_thread(lcs.call_auth_endpoint)
+
+
+async def read(token, query):
+    """Async lcs.read."""
+    resp_parsed = await lcs_post("/read", lcs.read_request(token, query), idempotent=True)
+    if lcs.token_rejected(token, resp_parsed):
+        token = await _director_token()
+        if token == 400:
+            return None
+        resp_parsed = await lcs_post("/read", lcs.read_request(token, query), idempotent=True)
+    return resp_parsed
+
+
+async def get_names(emails):
+    """Async lcs.get_names, sharing name_cache."""
+    names, missing = lcs.cached_names(emails)
+    if not missing:
+        return names
+    token = await _director_token()
+    if token == 400:
+        return names
+    return lcs.store_names(names, missing, await read(token, lcs.names_query(missing)))
+
+
+async def user_names(emails):
+    """Async names.user_names."""
+    names = {}
+    users = await acoll("users").find({"_id": {"$in": list(emails)}}, NAME_PROJECTION).to_list(None)
+    for user in users:
+        name = stored_name(user)
+        if name is not None:
+            names[user["_id"]] = name
+    missing = [email for email in emails if email not in names]
+    if missing:
+        names.update(await get_names(missing))
+    return names
+
+
+async def user_team_id(email):
+    user = await acoll("users").find_one({"_id": email}, {"team_id": 1})
+    if user is not None and "team_id" in user:
+        return user["team_id"]
+    team = await acoll("teams").find_one({"members": {"$all": [email]}}, {"_id": 1})
+    return team["_id"] if team else None
+
+
+async def find_user_team(email, projection=None):
+    team_id = await user_team_id(email)
+    if team_id is None:
+        return None
+    return await acoll("teams").find_one({"_id": team_id}, projection)
+
+
+async def open_teams_version():
+    doc = await acoll("meta").find_one({"_id": "open_teams"}, {"version": 1})
+    return doc["version"] if doc else 0
+
+
+async def read_row(row_id):
+    return fresh_matches(await acoll("recommendations").find_one({"_id": row_id}))
@@ -0,0 +1,230 @@
+"""Read routes served through app.aio when ASYNC_MODE is on.
+
+serve_async checks the body first, like ensure_json. Each handler then
+starts the caller's token validation together with the Mongo reads (and LCS
+name lookups) it doesn't depend on, and checks the result in the same order
+as the sync decorators: 404 for a bad token, then the feature flag, then the
+paging fields. Handlers return (code, body, extra) for return_resp, where
+extra may carry the response's "etag" (and code 304 means not modified).
+"""
+import asyncio
+from functools import wraps
+
+from flask import request
+
+import app.aio as aio
+import app.config as config
+from app.names import pop_names, stored_name
+from app.open_teams import (
+    ensure_search_index,
+    open_teams_cache,
+    open_teams_etag,
+    open_teams_query,
+    open_teams_result,
+    search_terms,
+)
+from app.team_profile import (
+    add_member_names,
+    names_resolved,
+    profile_cache_ttl,
+    team_profile_cache,
+    team_profile_etag,
+)
+from app.recommendations import store_team_row, store_user_row
+from app.schemas import body_error, feature_error, login_fields, request_body
+from app.util import Page, not_modified, page_params, return_resp
+
+
+def serve_async(handler, feature=None):
+    """Serve a route with `handler(email, token, data, if_none_match)` when ASYNC_MODE is
+    set and the handler accepts the request (returns a coroutine rather than
+    None); otherwise fall through to the sync view. The body is checked
+    against the feature's schema first, as ensure_json would."""
+
+    def inner(fn):
+        @wraps(fn)
+        def wrapper():
+            if not getattr(config, "ASYNC_MODE", False):
+                return fn()
+            error = body_error(feature)
+            if error is not None:
+                return return_resp(*error)
+            data = request_body()
+            coro = handler(*login_fields(data), data, request.if_none_match)
+            if coro is None:
+                return fn()
+            code, body, extra = aio.run(coro)
+            etag = extra.pop("etag", None)
+            if code == 304:
+                return not_modified(etag)
+            resp = return_resp(code, body, **extra)
+            if etag is not None:
+                resp.set_etag(etag)
+            return resp
+
+        return wrapper
+
+    return inner
+
+
+def _denied(valid, feature):
+    if valid != 200:
+        return 404, "Invalid request", {}
+    error = feature_error(feature)
+    if error is not None:
+        return error + ({},)
+    return None
+
+
+def _page(matches, limit, after, empty_code, cursor_code):
+    paged = limit is not None or after is not None
+    if limit is None:
+        limit = getattr(config, "RECOMMENDATIONS_LIMIT", 50)
+    page = Page(matches, limit, skip_through=after)
+    if page.expired:
+        return cursor_code, "Invalid or expired cursor", {}
+    if not page:
+        return empty_code, "No recommendations found", {}
+    return 200, list(page), ({"next": page.next} if paged else {})
+
+
+def user_profile(email, token, data, if_none_match):
+    if request.method != "GET":
+        return None
+    return _user_profile(email, token)
+
+
+async def _user_profile(email, token):
+    valid, user = await asyncio.gather(aio.validate_user(email, token), aio.acoll("users").find_one({"_id": email}))
+    denied = _denied(valid, "user profile")
+    if denied:
+        return denied
+    if not user:
+        return 200, "User Not found", {}
+    name = stored_name(user)
+    if name is None:
+        name = (await aio.get_names([email])).get(email, "")
+    pop_names(user)
+    user.update({"name": name})
+    return 200, user, {}
+
+
+async def team_profile(email, token, data, if_none_match):
+    valid, team = await asyncio.gather(aio.validate_user(email, token), aio.find_user_team(email))
+    denied = _denied(valid, "team profile")
+    if denied:
+        return denied
+    if not team:
+        return 400, "Team Not found", {}
+    etag = team_profile_etag(team)
+    if if_none_match.contains(etag):
+        return 304, None, {"etag": etag}
+    cached = team_profile_cache.get(etag)
+    if cached is None:
+        cached = add_member_names(team, await aio.user_names(team["members"]))
+        ttl = profile_cache_ttl(cached)
+        if ttl is not None:
+            team_profile_cache.set(etag, cached, ttl)
+    return 200, cached, ({"etag": etag} if names_resolved(cached) else {})
+
+
+async def team_recommendations(email, token, data, if_none_match):
+    valid, matches = await asyncio.gather(aio.validate_user(email, token), aio.read_row("user:" + email))
+    denied = _denied(valid, "team recommendations")
+    if denied:
+        return denied
+    try:
+        limit, after = page_params(data)
+    except ValueError as e:
+        return 401, str(e).capitalize(), {}
+    if matches is None:
+        user = await aio.acoll("users").find_one({"_id": email})
+        if not user:
+            return 403, "Invalid user", {}
+        if user.get("hasateam") is True:
+            return 402, "User in a team", {}
+        if "skills" not in user or not user["skills"]:
+            return 400, "No recommendations found", {}
+        matches = await asyncio.to_thread(store_user_row, user)
+    return _page(matches, limit, after, 400, 401)
+
+
+async def _team_row(email):
+    team_id = await aio.user_team_id(email)
+    if team_id is None:
+        return None, None
+    return team_id, await aio.read_row("team:" + team_id)
+
+
+async def individual_recommendations(email, token, data, if_none_match):
+    valid, (team_id, matches) = await asyncio.gather(aio.validate_user(email, token), _team_row(email))
+    denied = _denied(valid, "individual recommendations")
+    if denied:
+        return denied
+    try:
+        limit, after = page_params(data)
+    except ValueError as e:
+        return 403, str(e).capitalize(), {}
+    if team_id is None:
+        return 400, "User not in a team", {}
+    if matches is None:
+        team = await aio.acoll("teams").find_one({"_id": team_id})
+        if team is None:
+            return 400, "User not in a team", {}
+        if "partnerskills" not in team or not team["partnerskills"]:
+            return 401, "Profile not complete", {}
+        matches = await asyncio.to_thread(store_team_row, team) or []
+    code, matches, extra = _page(matches, limit, after, 402, 403)
+    if code != 200:
+        return code, matches, extra
+    names = await aio.user_names([m["_id"] for m in matches])
+    for m in matches:
+        m.update({"name": names.get(m["_id"], "")})
+    return 200, matches, extra
+
+
+def open_teams(email, token, data, if_none_match):
+    # streamed responses stay on the sync path
+    if data.get("stream") is True:
+        return None
+    return _open_teams(email, token, data, if_none_match)
+
+
+async def _open_teams(email, token, data, if_none_match):
+    try:
+        limit, after = page_params(data)
+    except ValueError as e:
+        denied = _denied(await aio.validate_user(email, token), "open teams")
+        return denied or (401, str(e).capitalize(), {})
+    search = data.get("filter")
+    terms = search_terms(search) if search else []
+    valid, (etag, result) = await asyncio.gather(
+        aio.validate_user(email, token), _find_open_teams(terms, limit, after, if_none_match)
+    )
+    denied = _denied(valid, "open teams")
+    if denied:
+        return denied
+    if result is None:
+        return 304, None, {"etag": etag}
+    code, body, extra = result
+    return code, body, dict(extra, etag=etag)
+
+
+async def _find_open_teams(terms, limit, after, if_none_match):
+    """(etag, result), where result is None if the client's copy is current."""
+    version = await aio.open_teams_version()
+    etag = open_teams_etag(version, terms, limit, after, False)
+    if if_none_match.contains(etag):
+        return etag, None
+    result = open_teams_cache.get(etag)
+    if result is None:
+        if terms:
+            await asyncio.to_thread(ensure_search_index)
+        query, projection, sort, skip_through = open_teams_query(terms, after)
+        cursor = aio.acoll("teams").find(query, projection).sort(sort)
+        if limit is not None and skip_through is None:
+            cursor = cursor.limit(limit + 1)
+        page = Page(await cursor.to_list(None), limit, skip_through=skip_through)
+        result = open_teams_result(page, limit, after)
+        open_teams_cache.set(etag, result)
+    return etag, result
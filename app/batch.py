@@ -0,0 +1,153 @@
+"""GET /batch: several read operations in one authenticated request.
+
+    {"user_email": ..., "token": ..., "operations": [
+        {"op": "user-profile"},
+        {"op": "open-teams", "limit": 20},
+        {"op": "team-recommendations"}]}
+
+The caller's token is validated once. Each operation takes the body fields of
+the route it is named after, is checked against that route's schema and
+feature flag, and runs concurrently with the others: on a thread pool, or on
+the event loop in ASYNC_MODE. The response body lists one
+{"op", "statusCode", "body", ...} result per operation, in request order.
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import copy_current_request_context
+from werkzeug.datastructures import ETags
+
+import app.aio as aio
+import app.async_views as async_views
+import app.config as config
+import app.unit_of_work as unit_of_work
+from app.individual_recommendations import get_individual_recommendations
+from app.open_teams import return_open_teams
+from app.schemas import body_error, feature_error
+from app.team_profile import team_profile
+from app.team_recommendations import get_team_recommendations
+from app.user_profile import get_user_profile
+from app.util import page_params, return_resp
+
+log = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def _open_teams(email, data):
+    try:
+        limit, after = page_params(data)
+    except ValueError as e:
+        return return_resp(401, str(e).capitalize())
+    return return_open_teams(data.get("filter") or None, limit, after)
+
+
+def _team_recommendations(email, data):
+    try:
+        limit, after = page_params(data)
+    except ValueError as e:
+        return return_resp(401, str(e).capitalize())
+    return get_team_recommendations(email, limit, after)
+
+
+def _individual_recommendations(email, data):
+    try:
+        limit, after = page_params(data)
+    except ValueError as e:
+        return return_resp(403, str(e).capitalize())
+    return get_individual_recommendations(email, limit, after)
+
+
+# op -> (feature, handler(email, data) returning a response, async handler)
+OPERATIONS = {
+    "user-profile": ("user profile", lambda email, data: get_user_profile(email), async_views.user_profile),
+    "team-profile": ("team profile", lambda email, data: team_profile(email), async_views.team_profile),
+    "open-teams": ("open teams", _open_teams, async_views.open_teams),
+    "team-recommendations": ("team recommendations", _team_recommendations, async_views.team_recommendations),
+    "individual-recommendations": (
+        "individual recommendations", _individual_recommendations, async_views.individual_recommendations,
+    ),
+}
+
+
+def _pool():
+    global _executor, _executor_pid
+    if _executor_pid != os.getpid():
+        with _lock:
+            if _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(config, "BATCH_WORKERS", 8), thread_name_prefix="teamru-batch"
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _rejected(op, data):
+    if op not in OPERATIONS:
+        return 400, "Unknown operation"
+    feature = OPERATIONS[op][0]
+    return body_error(feature, data) or feature_error(feature)
+
+
+def _run_sync(op, email, data, unit):
+    # each thread has its own g; share the request's document cache
+    unit_of_work.use(unit)
+    try:
+        payload = OPERATIONS[op][1](email, data).get_json()
+    except Exception:
+        log.exception("batch operation %s failed", op)
+        return 500, "Operation failed", {}
+    return payload.pop("statusCode"), payload.pop("body"), payload
+
+
+async def _run_async(op, email, token, data):
+    try:
+        code, body, extra = await OPERATIONS[op][2](email, token, data, ETags())
+    except Exception:
+        log.exception("batch operation %s failed", op)
+        return 500, "Operation failed", {}
+    extra.pop("etag", None)
+    return code, body, extra
+
+
+async def _gather(coros):
+    return await asyncio.gather(*coros)
+
+
+def run_batch(email, token, operations):
+    """Results of the operations for the (already validated) caller."""
+    ops = [op["op"] for op in operations]
+    # every operation acts for the caller, and streaming doesn't nest
+    bodies = [
+        {k: v for k, v in dict(op, user_email=email, token=token).items() if k not in ("op", "stream")}
+        for op in operations
+    ]
+    results = [None] * len(ops)
+    pending = []
+    for i, (op, data) in enumerate(zip(ops, bodies)):
+        error = _rejected(op, data)
+        if error is not None:
+            results[i] = error + ({},)
+        else:
+            pending.append(i)
+    if getattr(config, "ASYNC_MODE", False):
+        done = aio.run(_gather([_run_async(ops[i], email, token, bodies[i]) for i in pending]))
+    else:
+        # one request context copy per thread; a copy can't be pushed twice at once
+        unit = unit_of_work.current()
+        futures = [
+            _pool().submit(copy_current_request_context(_run_sync), ops[i], email, bodies[i], unit)
+            for i in pending
+        ]
+        done = [future.result() for future in futures]
+    for i, result in zip(pending, done):
+        results[i] = result
+    return [
+        dict(extra, op=op, statusCode=code, body=body)
+        for op, (code, body, extra) in zip(ops, results)
+    ]
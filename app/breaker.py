@@ -0,0 +1,116 @@
+"""Circuit breaker for LCS.
+
+Every LCS call (app/lcs.py and app/aio.py) asks lcs_breaker.allow() first and
+reports how it went with record(). The breaker keeps the outcomes of the last
+LCS_BREAKER_WINDOW calls and opens when, over at least LCS_BREAKER_MIN_CALLS
+of them, the share of failures (connection errors, timeouts, 5xx) reaches
+LCS_BREAKER_FAILURE_RATE or the share slower than LCS_BREAKER_SLOW_CALL
+seconds reaches LCS_BREAKER_SLOW_RATE.
+
+While open, calls fail fast (the caller gets None, as if LCS couldn't be
+reached) for LCS_BREAKER_OPEN_SECONDS. Then the breaker is half-open and lets
+LCS_BREAKER_PROBES calls through: if they all succeed quickly it closes,
+otherwise it opens again. Callers degrade instead of waiting on LCS; see
+schemas.validate_user for sessions and lcs.get_names for names.
+
+State is per process. Transitions are logged and exported as the
+teamru_circuit_breaker_state gauge and the
+teamru_circuit_breaker_transitions_total counter; calls refused while open
+count as outcome "rejected" in teamru_lcs_requests_total.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from app.metrics import observe_breaker
+import app.config as config
+
+log = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+
+class CircuitBreaker:
+    def __init__(self, name, clock=time.monotonic):
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._state = CLOSED
+        self._changed_at = self._clock()
+        self._outcomes = deque(maxlen=getattr(config, "LCS_BREAKER_WINDOW", 20))
+        self._probes = 0
+        self._probe_successes = 0
+
+    @property
+    def state(self):
+        return self._state
+
+    def _transition(self, state):
+        log.warning("%s circuit breaker: %s -> %s", self.name, self._state, state)
+        observe_breaker(self.name, self._state, state)
+        self._state = state
+        self._changed_at = self._clock()
+        self._outcomes.clear()
+        self._probes = 0
+        self._probe_successes = 0
+
+    def allow(self):
+        """Whether a call may go out now. Every allowed call must be followed
+        by record()."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._state == CLOSED:
+                return True
+            elapsed = self._clock() - self._changed_at
+            open_seconds = getattr(config, "LCS_BREAKER_OPEN_SECONDS", 30)
+            if self._state == OPEN:
+                if elapsed < open_seconds:
+                    return False
+                self._transition(HALF_OPEN)
+            elif elapsed >= open_seconds:
+                # probes that never reported back count as lost
+                self._changed_at = self._clock()
+                self._probes = self._probe_successes
+            if self._probes < getattr(config, "LCS_BREAKER_PROBES", 1):
+                self._probes += 1
+                return True
+            return False
+
+    def record(self, ok, seconds):
+        """Outcome of an allowed call: ok is False for errors, timeouts and
+        5xx responses."""
+        slow = seconds > getattr(config, "LCS_BREAKER_SLOW_CALL", 2.0)
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if not ok or slow:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= getattr(config, "LCS_BREAKER_PROBES", 1):
+                    self._transition(CLOSED)
+                return
+            if self._state == OPEN:
+                return
+            self._outcomes.append((ok, slow))
+            calls = len(self._outcomes)
+            if calls < getattr(config, "LCS_BREAKER_MIN_CALLS", 10):
+                return
+            failures = sum(1 for ok, _ in self._outcomes if not ok)
+            slow_calls = sum(1 for _, slow in self._outcomes if slow)
+            if (
+                failures / calls >= getattr(config, "LCS_BREAKER_FAILURE_RATE", 0.5)
+                or slow_calls / calls >= getattr(config, "LCS_BREAKER_SLOW_RATE", 0.8)
+            ):
+                self._transition(OPEN)
+
+
+lcs_breaker = CircuitBreaker("lcs")
@@ -0,0 +1,232 @@
+"""Bulk import and export of users and teams, run through the flask CLI (see
+app/commands.py).
+
+Both directions use the same flat records, in CSV or JSON lines:
+
+    users: email, skills, prizes
+    teams: name, desc, skills, prizes, members, complete
+
+skills, prizes and members are comma separated strings (as in the API) or, in
+JSON lines, lists. They are normalized the same way as in the API. Exports
+also carry the fields imports leave alone (hasateam, team_id and
+potentialteams for users, interested for teams).
+"""
+import csv
+import json
+import time
+
+from flask import current_app
+from pymongo import UpdateOne
+
+from app.db import bump_open_teams_version, coll, versioned
+from app.recommendations import refresh_team, refresh_user
+from app.util import format_string
+
+USER_FIELDS = ["email", "skills", "prizes", "hasateam", "team_id", "potentialteams"]
+TEAM_FIELDS = ["name", "desc", "skills", "prizes", "members", "complete", "interested"]
+
+
+def read_records(f, fmt):
+    """Stream dicts from a CSV (with a header row) or JSON lines file."""
+    if fmt == "csv":
+        yield from csv.DictReader(f)
+    else:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _list(value):
+    if isinstance(value, list):
+        return [str(v).strip().lower() for v in value if str(v).strip()]
+    return [v for v in format_string(value) if v]
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def user_op(record):
+    """UpdateOne upserting a user profile, or None if the record has no email.
+    Like POST /user-profile, an existing profile only gets new skills and
+    prizes."""
+    email = (record.get("email") or "").strip().lower()
+    if not email:
+        return None
+    return UpdateOne(
+        {"_id": email},
+        {
+            "$set": {"skills": _list(record.get("skills")), "prizes": _list(record.get("prizes"))},
+            "$setOnInsert": {"hasateam": False, "team_id": None, "potentialteams": []},
+        },
+        upsert=True,
+    )
+
+
+def team_ops(record):
+    """(team name, members, team UpdateOne, [member UpdateOnes]) upserting a
+    team and pointing its members at it, or None if the record has no name,
+    no members or more than 4."""
+    name = (record.get("name") or "").strip().lower()
+    members = _list(record.get("members"))
+    if not name or not members or len(members) > 4:
+        return None
+    team = UpdateOne(
+        {"_id": name},
+        {
+            "$set": {
+                "desc": (record.get("desc") or "").strip().lower(),
+                "partnerskills": _list(record.get("skills")),
+                "prizes": _list(record.get("prizes")),
+                "members": members,
+                "complete": _flag(record.get("complete")),
+                # a fresh version, so cached /team-profile responses go stale
+                "version": time.time_ns() // 1000,
+            },
+            "$setOnInsert": {"interested": []},
+        },
+        upsert=True,
+    )
+    users = [
+        UpdateOne(
+            {"_id": email},
+            {"$set": {"hasateam": True, "team_id": name}, "$setOnInsert": {"skills": [], "prizes": []}},
+            upsert=True,
+        )
+        for email in members
+    ]
+    return name, members, team, users
+
+
+def _write(coll_name, ops, stats):
+    if ops:
+        result = coll(coll_name).bulk_write(ops, ordered=False)
+        stats["inserted"] += result.upserted_count
+        stats["modified"] += result.modified_count
+
+
+def import_users(records, batch_size=1000):
+    """Upsert user records in unordered bulk writes of batch_size. Returns
+    counts of records read, profiles inserted/modified and records skipped,
+    and the elapsed seconds."""
+    stats = {"records": 0, "inserted": 0, "modified": 0, "skipped": 0}
+    start = time.perf_counter()
+    batch = []
+    for record in records:
+        stats["records"] += 1
+        op = user_op(record)
+        if op is None:
+            stats["skipped"] += 1
+            continue
+        batch.append(op)
+        if len(batch) == batch_size:
+            _write("users", batch, stats)
+            batch = []
+    _write("users", batch, stats)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def _move_members(names, members):
+    """Before a batch of teams is written: take its members off any other
+    team (deleting teams left empty) and clear the team pointer of users a
+    re-imported team no longer lists. Returns the other teams and the
+    dropped users."""
+    old = coll("teams").find({"_id": {"$in": names}}, {"members": 1})
+    dropped = list({email for team in old for email in team.get("members") or []} - set(members))
+    others = [
+        team["_id"]
+        for team in coll("teams").find({"_id": {"$nin": names}, "members": {"$in": members}}, {"_id": 1})
+    ]
+    if others:
+        coll("teams").update_many({"_id": {"$in": others}}, versioned({"$pull": {"members": {"$in": members}}}))
+        coll("teams").delete_many({"_id": {"$in": others}, "members": {"$size": 0}})
+    if dropped:
+        coll("users").update_many(
+            {"_id": {"$in": dropped}, "team_id": {"$in": names}},
+            {"$set": {"hasateam": False, "team_id": None}},
+        )
+    return others, dropped
+
+
+def _write_teams(batch, stats, member_stats):
+    if not batch:
+        return
+    names = [name for name, _, _, _ in batch]
+    members = [email for _, emails, _, _ in batch for email in emails]
+    others, dropped = _move_members(names, members)
+    _write("teams", [team for _, _, team, _ in batch], stats)
+    _write("users", [op for _, _, _, users in batch for op in users], member_stats)
+    for name in names + others:
+        refresh_team(name)
+    for email in members + dropped:
+        refresh_user(email)
+
+
+def import_teams(records, batch_size=1000):
+    """Upsert team records, and their members' team pointers, in unordered
+    bulk writes. Members are taken off any team they were on before, and a
+    re-imported team's dropped members are freed; a member listed by two
+    records keeps the first and the second is skipped. Recommendation rows
+    of every team and user involved are queued for a refresh. Returns the
+    same counts as import_users (for teams)."""
+    stats = {"records": 0, "inserted": 0, "modified": 0, "skipped": 0}
+    member_stats = {"inserted": 0, "modified": 0}
+    start = time.perf_counter()
+    placed = {}
+    batch = []
+    for record in records:
+        stats["records"] += 1
+        ops = team_ops(record)
+        if ops is None or any(placed.get(email, ops[0]) != ops[0] for email in ops[1]):
+            stats["skipped"] += 1
+            continue
+        placed.update(dict.fromkeys(ops[1], ops[0]))
+        batch.append(ops)
+        if len(batch) == batch_size:
+            _write_teams(batch, stats, member_stats)
+            batch = []
+    _write_teams(batch, stats, member_stats)
+    if stats["inserted"] or stats["modified"]:
+        bump_open_teams_version()
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def _user_record(doc):
+    return dict({k: doc.get(k) for k in USER_FIELDS[1:]}, email=doc["_id"])
+
+
+def _team_record(doc):
+    record = {k: doc.get(k) for k in TEAM_FIELDS}
+    record.update({"name": doc["_id"], "skills": doc.get("partnerskills")})
+    return record
+
+
+def export_records(kind):
+    """Stream every user or team as an export record."""
+    to_record = _user_record if kind == "users" else _team_record
+    for doc in coll(kind).find({}, batch_size=1000):
+        yield to_record(doc)
+
+
+def write_records(records, f, fmt, fields):
+    """Write records as CSV (lists joined with ", ") or JSON lines. Returns the
+    number written."""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(f, fields, extrasaction="ignore")
+        writer.writeheader()
+        for record in records:
+            writer.writerow({
+                k: ", ".join(v) if isinstance(v, list) else ("" if v is None else v)
+                for k, v in record.items()
+            })
+            count += 1
+    else:
+        for record in records:
+            f.write(current_app.json.dumps(record, separators=(",", ":")) + "\n")
+            count += 1
+    return count
@@ -0,0 +1,121 @@
+import os
+import time
+
+import click
+from app import app
+from app.bulk import (
+    TEAM_FIELDS,
+    USER_FIELDS,
+    export_records,
+    import_teams,
+    import_users,
+    read_records,
+    write_records,
+)
+from app.matchmaking import matchmake
+from app.names import refresh_names
+from app.indexes import ensure_indexes, verify_query_plans
+from app.migrations import backfill_team_ids
+from app.recommendations import drain
+
+_FORMAT = click.Choice(["csv", "jsonl"])
+
+
+def _format(fmt, f):
+    """--format, or else the file's extension (jsonl for stdin/stdout)."""
+    if fmt:
+        return fmt
+    return "csv" if os.path.splitext(f.name)[1].lower() == ".csv" else "jsonl"
+
+
+@app.cli.command("init-indexes")
+@click.option("--verify/--no-verify", default=True, help="Fail if a canonical query still does a COLLSCAN.")
+def init_indexes(verify):
+    """Create the users/teams indexes and check the handlers' query plans."""
+    for coll_name, names in ensure_indexes().items():
+        click.echo("%s: %s" % (coll_name, ", ".join(names)))
+    if verify:
+        try:
+            verify_query_plans()
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        click.echo("all canonical queries use an index")
+
+
+@app.cli.command("migrate-team-ids")
+def migrate_team_ids():
+    """Backfill the users.team_id pointer from teams.members."""
+    click.echo("updated %d users" % backfill_team_ids())
+
+
+def _bulk_import(kind, load, f, fmt, batch_size):
+    stats = load(read_records(f, _format(fmt, f)), batch_size)
+    # the imports queue recommendation refreshes; finish them before exiting
+    drain()
+    seconds = stats["seconds"]
+    click.echo("%d %s records in %.2fs (%.0f/s): %d inserted, %d updated, %d skipped" % (
+        stats["records"], kind, seconds, stats["records"] / seconds if seconds else 0,
+        stats["inserted"], stats["modified"], stats["skipped"],
+    ))
+
+
+@app.cli.command("import-users")
+@click.argument("file", type=click.File("r"))
+@click.option("--format", "fmt", type=_FORMAT, help="Defaults to the file extension.")
+@click.option("--batch-size", default=1000, show_default=True)
+def import_users_command(file, fmt, batch_size):
+    """Upsert hacker profiles (email, skills, prizes) from CSV or JSON lines."""
+    _bulk_import("user", import_users, file, fmt, batch_size)
+
+
+@app.cli.command("import-teams")
+@click.argument("file", type=click.File("r"))
+@click.option("--format", "fmt", type=_FORMAT, help="Defaults to the file extension.")
+@click.option("--batch-size", default=1000, show_default=True)
+def import_teams_command(file, fmt, batch_size):
+    """Upsert teams (name, desc, skills, prizes, members, complete) from CSV or
+    JSON lines and point their members at them."""
+    _bulk_import("team", import_teams, file, fmt, batch_size)
+
+
+@app.cli.command("export")
+@click.argument("kind", type=click.Choice(["users", "teams"]))
+@click.argument("file", type=click.File("w"), default="-")
+@click.option("--format", "fmt", type=_FORMAT, help="Defaults to the file extension.")
+def export_command(kind, file, fmt):
+    """Stream every user or team to CSV or JSON lines (stdout by default)."""
+    start = time.perf_counter()
+    fields = USER_FIELDS if kind == "users" else TEAM_FIELDS
+    count = write_records(export_records(kind), file, _format(fmt, file), fields)
+    seconds = time.perf_counter() - start
+    click.echo("%d %s in %.2fs (%.0f/s)" % (count, kind, seconds, count / seconds if seconds else 0), err=True)
+
+
+@app.cli.command("matchmake")
+@click.option("--dry-run", is_flag=True, help="Report the assignment without storing it.")
+def matchmake_command(dry_run):
+    """Suggest a team for every unteamed hacker, filling open teams up to 4
+    members to cover the most wanted skills and prizes (see /placements)."""
+    stats = matchmake(dry_run)
+    click.echo(
+        "%d of %d hackers placed on %d of %d teams, %.0f%% of wanted skill/prize weight covered"
+        % (stats["placed"], stats["hackers"], stats["teams_filled"], stats["teams"], 100 * stats["coverage"])
+    )
+    click.echo("load %.2fs, assign %.2fs, write %.2fs%s" % (
+        stats["load_seconds"], stats["assign_seconds"], stats["write_seconds"], " (dry run)" if dry_run else "",
+    ))
+
+
+@app.cli.command("refresh-names")
+@click.option("--batch-size", default=500, show_default=True, help="Users per LCS /read and bulk write.")
+@click.option("--max-age", type=int, help="Seconds; defaults to NAME_MAX_AGE.")
+@click.option("--every", type=int, help="Keep running, sweeping every this many seconds.")
+def refresh_names_command(batch_size, max_age, every):
+    """Re-read stale or missing hacker names from LCS into users documents."""
+    while True:
+        start = time.perf_counter()
+        updated = refresh_names(batch_size, max_age)
+        click.echo("refreshed %d names in %.2fs" % (updated, time.perf_counter() - start))
+        if not every:
+            return
+        time.sleep(every)
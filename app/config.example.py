@@ -1,13 +1,107 @@
 LCS_BASE_URL = ""
 
+# LCS HTTP client (app/lcs.py): pooled keep-alive connections per process,
+# timeouts in seconds, retries with exponential backoff for /read and /validate
+LCS_POOL_SIZE = 20
+LCS_CONNECT_TIMEOUT = 3.05
+LCS_READ_TIMEOUT = 10
+LCS_RETRIES = 2
+LCS_RETRY_BACKOFF = 0.1
+
+# circuit breaker around LCS (app/breaker.py): over the last WINDOW calls (at
+# least MIN_CALLS), open when this share fails (errors, timeouts, 5xx) or is
+# slower than SLOW_CALL seconds; refuse calls for OPEN_SECONDS, then let PROBES
+# trial calls through and close if they succeed
+LCS_BREAKER_WINDOW = 20
+LCS_BREAKER_MIN_CALLS = 10
+LCS_BREAKER_FAILURE_RATE = 0.5
+LCS_BREAKER_SLOW_CALL = 2.0
+LCS_BREAKER_SLOW_RATE = 0.8
+LCS_BREAKER_OPEN_SECONDS = 30
+LCS_BREAKER_PROBES = 1
+# while LCS is unreachable, keep accepting sessions it validated within this
+# many seconds (0 to reject everyone); names are left out of responses
+LCS_DEGRADED_SESSION_TTL = 3600
+
+# serve the read routes (profiles, open teams, recommendations) through the
+# asyncio path in app/aio.py, overlapping LCS and Mongo round trips per request
+ASYNC_MODE = False
+
+# response encoder (app/json_provider.py): "orjson" when it is installed, or
+# "json" for the standard library; both produce the same bytes
+JSON_ENCODER = "orjson"
+
 DIRECTOR_CREDENTIALS = {"email": "", "password": ""}
 
+# seconds; the TTL is only used when /authorize doesn't return valid_until
+DIRECTOR_TOKEN_TTL = 3600
+DIRECTOR_TOKEN_REFRESH_MARGIN = 300
+
+# hacker display names resolved through LCS /read (app/lcs.py), TTLs in seconds
+NAME_CACHE_SIZE = 10000
+NAME_CACHE_TTL = 600
+NAME_CACHE_NEGATIVE_TTL = 60
+# names stored on users documents (app/names.py) older than this many seconds
+# are re-read from LCS by "flask refresh-names"
+NAME_MAX_AGE = 86400
+
 
 # uri should contain auth and default database(database name)
 DB_URI = ""
 
+# connection pool and timeouts used by the per-process MongoClient in app/db.py
+DB_MAX_POOL_SIZE = 100
+DB_MIN_POOL_SIZE = 0
+DB_CONNECT_TIMEOUT_MS = 5000
+DB_SERVER_SELECTION_TIMEOUT_MS = 5000
+DB_SOCKET_TIMEOUT_MS = 10000
+
+# None keeps the defaults from DB_URI (e.g. "majority", "local", "primaryPreferred")
+DB_WRITE_CONCERN = None
+DB_READ_CONCERN = None
+DB_READ_PREFERENCE = None
+
+# create the indexes from app/indexes.py when the app starts (also available as
+# "flask init-indexes"), and optionally refuse to start if a query still scans
+ENSURE_INDEXES_ON_STARTUP = True
+VERIFY_QUERY_PLANS_ON_STARTUP = False
+
+
+# LCS token validation cache (app/schemas.py), TTLs in seconds
+VALIDATE_CACHE_SIZE = 10000
+VALIDATE_CACHE_TTL = 60
+VALIDATE_CACHE_NEGATIVE_TTL = 10
+
+
+# cache documents read by _id for the rest of the request, and combine queued
+# updates into one write per document at its end (app/unit_of_work.py)
+UNIT_OF_WORK = True
+
+
+# default number of ranked matches returned by the recommendation endpoints
+RECOMMENDATIONS_LIMIT = 50
+# precomputed matches kept per user/team, and how old (seconds) a stored row
+# may be before the GET endpoints recompute it inline
+RECOMMENDATIONS_ROW_SIZE = 100
+RECOMMENDATIONS_MAX_STALENESS = 300
+# seconds between rebuilds of each worker's in-memory skill index
+# (app/similarity.py), which picks up profile changes made by other workers
+SIMILARITY_RELOAD_INTERVAL = 60
+
+
+# /batch: most operations per request, and threads running them (sync mode)
+BATCH_MAX_OPERATIONS = 10
+BATCH_WORKERS = 8
+
+
+# /open-teams and /team-profile responses cached by ETag (which includes the
+# team / open-teams version, so entries never go stale); TTL in seconds
+RESPONSE_CACHE_SIZE = 1000
+RESPONSE_CACHE_TTL = 300
+
 
-DB_COLLECTIONS = {"users": "users", "teams": "teams"}
+DB_COLLECTIONS = {"users": "users", "teams": "teams", "recommendations": "recommendations", "meta": "meta",
+                  "placements": "placements"}
 
 
 # 1 means that feature is enabled and 0 means that it is disabled
@@ -18,6 +112,7 @@ ENABLE_FEATURE = {
     "interested": 1,
     "leave team": 1,
     "open teams": 1,
+    "placements": 1,
     "start a team": 1,
     "team complete": 1,
     "team profile": 1,
@@ -1,28 +1,50 @@
 from app.util import return_resp
-from flask import request
-from app.db import coll
-from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
+from flask import g, request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.db import HAS_OPEN_SLOT, bump_open_teams_version, coll, versioned
+from app.names import store_missing_names
+from app.recommendations import refresh_team, refresh_user
+from app.schemas import request_body, ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
 
 
-@ensure_json()
+@ensure_json("confirm member")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("confirm member")
 def confirm():
     if request.method == 'POST':
-        data = request.get_json(silent=True)
-        email = data['user_email']
-        email = email.strip().lower()
-        if not data or 'email' not in data or not data['email']:
-            return return_resp(401, "Missing inf")
-        hacker = data['email'].strip().lower()
-        team_name = coll("teams").find_one({"members": {"$all": [email]}}, {"_id"})['_id']
-        team = coll("teams").find_one({"_id": team_name})
-        team_members = team['members']
-        complete = coll("teams").find_one({"_id": team_name, "complete": True})
-        if len(team_members) >= 4 or complete:
+        email = g.user_email
+        hacker = request_body()['email'].strip().lower()
+        team = coll("teams").find_one_and_update(
+            {"members": {"$all": [email], "$nin": [hacker]}, **HAS_OPEN_SLOT},
+            versioned({"$push": {"members": hacker}, "$pull": {"interested": hacker}}),
+            projection={"_id": 1},
+        )
+        if not team:
+            if not coll("teams").find_one({"members": {"$all": [email]}}, {"_id": 1}):
+                return return_resp(403, "User not in a team")
             return return_resp(402, "Team Complete")
-        coll("users").update_one({"_id": hacker}, {"$set": {"hasateam": True}})
-        coll("users").update_one({"_id": hacker}, {"$pull": {"potentialteams": team_name}})
-        coll("teams").update_one({"_id": team_name}, {"$push": {"members": hacker}})
-        coll("teams").update_one({"_id": team_name}, {"$pull": {"interested": hacker}})
+        team_name = team['_id']
+        try:
+            # like add_member, creates a bare profile for a hacker who never
+            # made one; one that already has a team collides on _id
+            claimed = coll("users").find_one_and_update(
+                {"_id": hacker, "hasateam": {"$ne": True}},
+                {
+                    "$set": {"hasateam": True, "team_id": team_name},
+                    "$pull": {"potentialteams": team_name},
+                    "$setOnInsert": {"skills": [], "prizes": []},
+                },
+                projection={"names_at": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            coll("teams").update_one({"_id": team_name}, versioned({"$pull": {"members": hacker}}))
+            bump_open_teams_version()
+            return return_resp(405, "Hacker in a team")
+        bump_open_teams_version()
+        store_missing_names(hacker, claimed)
+        refresh_user(hacker)
+        refresh_team(team_name)
         return return_resp(200, "Success")
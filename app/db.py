@@ -1,10 +1,101 @@
+import os
+import threading
+
 from pymongo import MongoClient
+from app.metrics import MongoCommandListener
+from app.unit_of_work import defer_update, scoped
 import app.config as config
 
+# One client per process. MongoClient is thread-safe and keeps its own
+# connection pool, but it is not fork-safe, so gunicorn workers that inherit a
+# client from the master get a fresh one on first use.
+_client = None
+_client_pid = None
+_collections = {}
+_lock = threading.Lock()
+
+# teams filter matching teams that are not marked complete and still have
+# fewer than 4 members, so a conditional $push can never overfill a team
+HAS_OPEN_SLOT = {"complete": {"$ne": True}, "members.3": {"$exists": False}}
+
+
+def _client_options():
+    options = {
+        "maxPoolSize": getattr(config, "DB_MAX_POOL_SIZE", 100),
+        "minPoolSize": getattr(config, "DB_MIN_POOL_SIZE", 0),
+        "connectTimeoutMS": getattr(config, "DB_CONNECT_TIMEOUT_MS", 5000),
+        "serverSelectionTimeoutMS": getattr(config, "DB_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": getattr(config, "DB_SOCKET_TIMEOUT_MS", 10000),
+        "connect": False,
+        "event_listeners": [MongoCommandListener()],
+    }
+    if getattr(config, "DB_WRITE_CONCERN", None) is not None:
+        options["w"] = config.DB_WRITE_CONCERN
+    if getattr(config, "DB_READ_CONCERN", None) is not None:
+        options["readConcernLevel"] = config.DB_READ_CONCERN
+    if getattr(config, "DB_READ_PREFERENCE", None) is not None:
+        options["readPreference"] = config.DB_READ_PREFERENCE
+    return options
+
+
+def get_client():
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _collections.clear()
+            _client = MongoClient(config.DB_URI, **_client_options())
+            _client_pid = pid
+    return _client
+
 
 def get_db():
-    return MongoClient(config.DB_URI).get_database()
+    return get_client().get_database()
 
 
 def coll(coll_name):
-    return get_db()[config.DB_COLLECTIONS[coll_name]]
+    """The named collection; inside a request, scoped to the request's unit
+    of work (see app/unit_of_work.py)."""
+    client = get_client()
+    collection = _collections.get(coll_name)
+    if collection is None:
+        collection = client.get_database()[config.DB_COLLECTIONS.get(coll_name, coll_name)]
+        _collections[coll_name] = collection
+    return scoped(coll_name, collection)
+
+
+def user_team_id(email):
+    """_id of the team email is on, or None, read from the user's team_id
+    pointer. Users written before team_id existed fall back to a members scan."""
+    user = coll("users").find_one({"_id": email}, {"team_id": 1})
+    if user is not None and "team_id" in user:
+        return user["team_id"]
+    team = coll("teams").find_one({"members": {"$all": [email]}}, {"_id": 1})
+    return team["_id"] if team else None
+
+
+def find_user_team(email, projection=None):
+    team_id = user_team_id(email)
+    if team_id is None:
+        return None
+    return coll("teams").find_one({"_id": team_id}, projection)
+
+
+def versioned(update):
+    """A teams update document that also bumps the team's version, which the
+    /team-profile ETag is derived from. Every write to a team goes through it."""
+    return {**update, "$inc": {**update.get("$inc", {}), "version": 1}}
+
+
+def open_teams_version():
+    """Counter bumped after every team write; the /open-teams ETag and
+    response cache are keyed on it."""
+    doc = coll("meta").find_one({"_id": "open_teams"}, {"version": 1})
+    return doc["version"] if doc else 0
+
+
+def bump_open_teams_version():
+    # queued until the end of the request, so several bumps are one write
+    defer_update(coll("meta"), "open_teams", {"$inc": {"version": 1}}, upsert=True)
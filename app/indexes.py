@@ -0,0 +1,103 @@
+"""Indexes for the hot queries in the handlers, and a check that those queries
+actually use them."""
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from app.db import coll
+
+SEARCH_INDEX = IndexModel(
+    [("desc", TEXT), ("partnerskills", TEXT), ("prizes", TEXT)],
+    name="teams_search",
+    weights={"partnerskills": 3, "prizes": 2, "desc": 1},
+    default_language="none",
+)
+
+INDEXES = {
+    "teams": [
+        # "which team is this user in"
+        IndexModel([("members", ASCENDING)], name="members"),
+        # open teams listing, paged by _id
+        IndexModel([("complete", ASCENDING), ("_id", ASCENDING)], name="complete_id"),
+        # team recommendations
+        IndexModel([("complete", ASCENDING), ("partnerskills", ASCENDING)], name="complete_partnerskills"),
+        IndexModel([("complete", ASCENDING), ("prizes", ASCENDING)], name="complete_prizes"),
+        SEARCH_INDEX,
+    ],
+    "users": [
+        # individual recommendations
+        IndexModel([("hasateam", ASCENDING), ("skills", ASCENDING)], name="hasateam_skills"),
+        IndexModel([("hasateam", ASCENDING), ("prizes", ASCENDING)], name="hasateam_prizes"),
+        # stale names for the name refresher
+        IndexModel([("names_at", ASCENDING)], name="names_at"),
+    ],
+    "recommendations": [
+        # rows listing a given user/team, refreshed when it changes
+        IndexModel([("matches._id", ASCENDING)], name="matches_id"),
+    ],
+    "placements": [
+        # hackers suggested for a team by the last matchmaking run
+        IndexModel([("team_id", ASCENDING), ("score", DESCENDING)], name="team_id_score"),
+    ],
+}
+
+_EMAIL = "hacker@example.com"
+_TEAM = "team"
+_TERMS = ["python"]
+
+# (collection, filter, sort) for each query the handlers run
+CANONICAL_QUERIES = [
+    ("teams", {"members": {"$all": [_EMAIL]}}, None),
+    ("teams", {"complete": False}, [("_id", ASCENDING)]),
+    ("teams", {"complete": False, "_id": {"$gt": _TEAM}}, [("_id", ASCENDING)]),
+    ("teams", {"complete": False, "$or": [
+        {"partnerskills": {"$in": _TERMS}}, {"prizes": {"$in": _TERMS}},
+    ]}, None),
+    ("teams", {"complete": False, "$text": {"$search": "python"}}, None),
+    ("users", {"hasateam": False, "$or": [
+        {"skills": {"$in": _TERMS}}, {"prizes": {"$in": _TERMS}},
+    ]}, None),
+    ("recommendations", {"_id": {"$regex": "^team:"}, "matches._id": _EMAIL}, None),
+    ("recommendations", {"_id": {"$regex": "^user:"}, "matches._id": _TEAM}, None),
+    ("placements", {"team_id": _TEAM}, [("score", DESCENDING), ("_id", ASCENDING)]),
+]
+
+
+def ensure_indexes():
+    """Create every declared index. Indexes that already exist with the same
+    definition are left alone, so this is safe to run on every start."""
+    created = {}
+    for coll_name, indexes in INDEXES.items():
+        created[coll_name] = coll(coll_name).create_indexes(indexes)
+    return created
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def collscans():
+    """Explain every canonical query and return the ones whose winning plan
+    contains a COLLSCAN, as (collection, filter) pairs."""
+    failures = []
+    for coll_name, query, sort in CANONICAL_QUERIES:
+        cursor = coll(coll_name).find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in set(_stages(winning_plan)):
+            failures.append((coll_name, query))
+    return failures
+
+
+def verify_query_plans():
+    failures = collscans()
+    if failures:
+        raise RuntimeError(
+            "queries falling back to COLLSCAN: "
+            + "; ".join("%s %s" % failure for failure in failures)
+        )
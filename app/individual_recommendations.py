@@ -1,57 +1,39 @@
-from app.util import return_resp
+from app.util import Page, return_resp
 from flask import request
-from app.lcs import call_auth_endpoint, get_name
-from app.db import coll
+from app.names import user_names
+from app.db import coll, user_team_id
+from app.recommendations import read_row, store_team_row
+import app.config as config
 from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
 
 
-def get_individual_recommendations(email):
+def get_individual_recommendations(email, limit=None, after=None):
     if request.method == "GET":
-        team = coll("teams").find_one({"members": {"$all": [email]}})
-        if not team:
+        paged = limit is not None or after is not None
+        if limit is None:
+            limit = getattr(config, "RECOMMENDATIONS_LIMIT", 50)
+        team_id = user_team_id(email)
+        if team_id is None:
             return return_resp(400, "User not in a team")
-        if "partnerskills" not in team or not team["partnerskills"]:
-            return return_resp(401, "Profile not complete")
-        if "prizes" not in team or not team["prizes"]:
-            prizes = []
-        else:
-            prizes = team["prizes"]
-        skills = team["partnerskills"]
-        emails = set()
-        matches = []
-        for skill in skills:
-            match = coll("users").aggregate(
-                [{"$match": {"hasateam": False, "skills": {"$all": [skill]}}}]
-            )
-            if not match:
-                continue
-            for m in match:
-                if m["_id"] not in emails:
-                    emails.add(m["_id"])
-                    dir_token = call_auth_endpoint()
-                    if dir_token != 400:
-                        name = get_name(dir_token, email)
-                    else:
-                        name = ""
-                    m.update({"name": name})
-                    matches.append(m)
-        for prize in prizes:
-            match = coll("users").aggregate(
-                [{"$match": {"hasateam": False, "prizes": {"$all": [prize]}}}]
-            )
-            if not match:
-                continue
-            for m in match:
-                if m["_id"] not in emails:
-                    emails.add(m["_id"])
-                    dir_token = call_auth_endpoint()
-                    if dir_token != 400:
-                        name = get_name(dir_token, email)
-                    else:
-                        name = ""
-                    m.update({"name": name})
-                    matches.append(m)
-        if not matches:
+        matches = read_row("team:" + team_id)
+        if matches is None:
+            team = coll("teams").find_one({"_id": team_id})
+            if team is None:
+                # a pointer left behind by a team that no longer exists
+                return return_resp(400, "User not in a team")
+            if "partnerskills" not in team or not team["partnerskills"]:
+                return return_resp(401, "Profile not complete")
+            # a complete team gets no recommendations (None)
+            matches = store_team_row(team) or []
+        page = Page(matches, limit, skip_through=after)
+        if page.expired:
+            return return_resp(403, "Invalid or expired cursor")
+        if not page:
             return return_resp(402, "No recommendations found")
-        else:
+        matches = list(page)
+        names = user_names([m["_id"] for m in matches])
+        for m in matches:
+            m.update({"name": names.get(m["_id"], "")})
+        if not paged:
             return return_resp(200, matches)
+        return return_resp(200, matches, next=page.next)
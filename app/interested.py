@@ -1,22 +1,29 @@
 from app.util import return_resp
 from flask import request
-from app.db import coll
+from app.db import HAS_OPEN_SLOT, bump_open_teams_version, coll, versioned
 from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
 
 
 def user_interested(email, team_name):
     if request.method == "POST":
-        user_in_a_team = coll("users").find_one({"_id": email, "hasateam": True})
-        if user_in_a_team:
+        # the user first: undoing it on a rejected team leaves the team's
+        # version, and every ETag derived from it, alone
+        added = coll("users").update_one(
+            {"_id": email, "hasateam": {"$ne": True}},
+            {"$addToSet": {"potentialteams": team_name}},
+        )
+        if added.matched_count == 0 and coll("users").find_one({"_id": email}, {"_id": 1}):
             return return_resp(403, "User in a team")
-        team = coll("teams").find_one({"_id": team_name})
+        team = coll("teams").find_one_and_update(
+            {"_id": team_name, **HAS_OPEN_SLOT},
+            versioned({"$addToSet": {"interested": email}}),
+            projection={"_id": 1},
+        )
         if not team:
-            return return_resp(402, "Invalid name")
-        complete = coll("teams").find_one({"_id": team_name, "complete": True})
-        if complete or len(team["members"]) >= 4:
+            if added.modified_count:
+                coll("users").update_one({"_id": email}, {"$pull": {"potentialteams": team_name}})
+            if not coll("teams").find_one({"_id": team_name}, {"_id": 1}):
+                return return_resp(402, "Invalid name")
             return return_resp(405, "Team complete")
-        coll("teams").update_one({"_id": team_name}, {"$push": {"interested": email}})
-        coll("users").update_one(
-            {"_id": email}, {"$push": {"potentialteams": team_name}}
-        )
+        bump_open_teams_version()
         return return_resp(200, "Success")
@@ -0,0 +1,137 @@
+"""JSON encoding for responses.
+
+JSONProvider produces the same bytes as Flask's default provider (sorted keys,
+compact separators, ASCII-only output) but encodes with orjson when it is
+installed and JSON_ENCODER is "orjson". Payloads orjson can't reproduce
+exactly go through the standard encoder instead: non-ASCII text, integers
+beyond 64 bits, non-string keys, and floats orjson writes differently (NaN and
+infinities, which it writes as null, and any json writes with an exponent,
+like 1e+16). Dataclasses are converted by default(), so their keys are sorted
+as Flask sorts them.
+
+Both encoders also accept the BSON types Mongo documents can carry: ObjectId
+and Decimal128 become strings, and datetimes are formatted as HTTP dates. The
+other types Flask's provider knows (Decimal, UUID, dataclasses, __html__)
+convert as they do there.
+"""
+import dataclasses
+import decimal
+import math
+import re
+import uuid
+from datetime import date
+
+from bson import Decimal128, ObjectId
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+import app.config as config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_COMPACT = (",", ":")
+# orjson output that may hold a float json writes differently: NaN and
+# infinities come out as null, exponents as e16 or e-7 (json: e+16, e-07),
+# and floats under 1e-4 as 0.0000... (json: 1e-05). Also matches ordinary
+# text; _floats_match() then checks the payload itself.
+_EXPONENT = re.compile(rb"e[-\d]")
+
+
+def _default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, Decimal128):
+        return str(o.to_decimal())
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError("Object of type %s is not JSON serializable" % type(o).__name__)
+
+
+def _maybe_odd_floats(encoded):
+    return b"null" in encoded or b"0.0000" in encoded or _EXPONENT.search(encoded) is not None
+
+
+def _floats_match(obj):
+    """False if obj holds a float orjson writes differently from json."""
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        t = type(o)
+        # exact type checks first: this runs over whole documents
+        if t is str:
+            continue
+        if t is dict:
+            stack.extend(o.values())
+        elif t is list or t is tuple:
+            stack.extend(o)
+        elif isinstance(o, float):
+            if not math.isfinite(o) or "e" in repr(o):
+                return False
+        elif isinstance(o, dict):
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple)):
+            stack.extend(o)
+        elif dataclasses.is_dataclass(t):
+            stack.append(dataclasses.asdict(o))
+    return True
+
+
+def _response_obj(args, kwargs):
+    """What jsonify(*args, **kwargs) serializes: a single argument as is,
+    several as a list, or the keyword arguments as an object."""
+    if args and kwargs:
+        raise TypeError("response() takes either args or kwargs, not both")
+    if not args and not kwargs:
+        return None
+    if len(args) == 1:
+        return args[0]
+    return args or kwargs
+
+
+class JSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+
+    def _fast_dumps(self, obj):
+        """Compact JSON bytes identical to dumps(), or None to use dumps()."""
+        if orjson is None or getattr(config, "JSON_ENCODER", "orjson") != "orjson":
+            return None
+        if not (self.ensure_ascii and self.sort_keys):
+            return None
+        try:
+            encoded = orjson.dumps(
+                obj,
+                default=self.default,
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return None
+        if not encoded.isascii():
+            return None
+        if _maybe_odd_floats(encoded) and not _floats_match(obj):
+            return None
+        return encoded
+
+    def dumps(self, obj, **kwargs):
+        if kwargs == {"separators": _COMPACT}:
+            encoded = self._fast_dumps(obj)
+            if encoded is not None:
+                return encoded.decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = _response_obj(args, kwargs)
+        encoded = self._fast_dumps(obj)
+        if encoded is None:
+            encoded = super().dumps(obj, separators=_COMPACT).encode()
+        return self._app.response_class(encoded + b"\n", mimetype=self.mimetype)
@@ -1,62 +1,340 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
 import requests
+from requests.adapters import HTTPAdapter
+from app.breaker import lcs_breaker
+from app.cache import TTLCache
+from app.metrics import observe_lcs, observe_lcs_rejected
 import app.config as config
 
 
-def call_auth_endpoint():
+class LcsClient:
+    """HTTP client for LCS.
+
+    Calls share one keep-alive requests.Session per process (pool sized by
+    LCS_POOL_SIZE) and are bounded by LCS_CONNECT_TIMEOUT/LCS_READ_TIMEOUT.
+    Idempotent calls are retried up to LCS_RETRIES times with exponential
+    backoff on connection errors, timeouts and 5xx responses, unless the
+    circuit breaker (app/breaker.py) is open, which refuses calls up front.
+    post() returns the parsed JSON body, or None if LCS couldn't be reached
+    or didn't answer with JSON.
+    """
+
+    def __init__(self):
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._lock:
+                if self._session is None or self._session_pid != pid:
+                    pool_size = getattr(config, "LCS_POOL_SIZE", 20)
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+                    self._session_pid = pid
+        return self._session
+
+    def post(self, path, data_dic, idempotent=False):
+        timeout = (getattr(config, "LCS_CONNECT_TIMEOUT", 3.05), getattr(config, "LCS_READ_TIMEOUT", 10))
+        for delay in retry_delays(idempotent):
+            if delay:
+                time.sleep(delay)
+            start = begin_attempt(path)
+            if start is None:
+                return None
+            try:
+                resp = self.session().post(config.LCS_BASE_URL + path, json=data_dic, timeout=timeout)
+            except requests.RequestException:
+                attempt_failed(path, start)
+                continue
+            if attempt_answered(path, start, resp.status_code):
+                return parse_response(resp)
+        return None
+
+
+# The retry, circuit breaker and metrics policy of a call, shared by
+# LcsClient.post and its async counterpart aio.lcs_post, which only differ in
+# how they send the request and wait.
+
+def retry_delays(idempotent):
+    """Seconds to wait before each attempt: none before the first, then
+    exponential backoff for the LCS_RETRIES retries idempotent calls get."""
+    yield 0
+    if idempotent:
+        backoff = getattr(config, "LCS_RETRY_BACKOFF", 0.1)
+        for retry in range(getattr(config, "LCS_RETRIES", 2)):
+            yield backoff * 2 ** retry
+
+
+def begin_attempt(path):
+    """Start time of an attempt, or None if the circuit breaker refuses it."""
+    if not lcs_breaker.allow():
+        observe_lcs_rejected(path)
+        return None
+    return time.perf_counter()
+
+
+def attempt_failed(path, start, outcome="error"):
+    seconds = time.perf_counter() - start
+    lcs_breaker.record(False, seconds)
+    if outcome is not None:
+        observe_lcs(path, outcome, seconds)
+
+
+def attempt_answered(path, start, status):
+    """Record a response; False if it is a 5xx worth retrying."""
+    seconds = time.perf_counter() - start
+    lcs_breaker.record(status < 500, seconds)
+    observe_lcs(path, str(status), seconds)
+    return status < 500
+
+
+def parse_response(resp):
+    """The JSON object LCS answered with, or None."""
+    try:
+        resp_parsed = resp.json()
+    except ValueError:
+        return None
+    return resp_parsed if isinstance(resp_parsed, dict) else None
+
+
+client = LcsClient()
+
+
+# Director token shared by every request in this process. It is reused until
+# DIRECTOR_TOKEN_REFRESH_MARGIN seconds before it expires, refreshed in the
+# background inside that window, and fetched synchronously once expired.
+_director_token = None
+_director_token_expires = 0.0
+_director_lock = threading.Lock()
+# guards _director_refreshing; the refresh itself holds _director_lock while
+# it waits on LCS, which callers inside the margin mustn't queue behind
+_refreshing_lock = threading.Lock()
+_director_refreshing = False
+
+
+def _token_expiry(auth):
+    valid_until = auth.get("valid_until")
+    if valid_until:
+        try:
+            expires = datetime.fromisoformat(valid_until)
+            if expires.tzinfo is None:
+                expires = expires.replace(tzinfo=timezone.utc)
+            return expires.timestamp()
+        except (TypeError, ValueError):
+            pass
+    return time.time() + getattr(config, "DIRECTOR_TOKEN_TTL", 3600)
+
+
+def _fetch_director_token():
     email = config.DIRECTOR_CREDENTIALS["email"]
     password = config.DIRECTOR_CREDENTIALS["password"]
     data_dic = {"email": email, "password": password}
-    resp = requests.post(config.LCS_BASE_URL + "/authorize", json=data_dic)
-    if not resp:
-        return 400
-    resp_parsed = resp.json()
-    if resp_parsed['statusCode'] == 200:
-        return resp_parsed['body']["auth"]["token"]
-    else:
-        return 400
+    resp_parsed = client.post("/authorize", data_dic)
+    if not resp_parsed:
+        return None
+    if resp_parsed.get('statusCode') == 200:
+        auth = resp_parsed['body']["auth"]
+        return auth["token"], _token_expiry(auth)
+    return None
 
 
-def get_name(token, email):
-    dir_email = "teambuilder@hackru.org"
-    data_dic = {"email": dir_email, "token": token, "query": {"email": email}}
-    resp = requests.post(config.LCS_BASE_URL + "/read", json=data_dic)
-    if not resp:
-        return 400
-    resp_parsed = resp.json()
-    if resp_parsed['statusCode'] == 200:
-        if not resp_parsed["body"]:
+def _refresh_director_token(stale):
+    global _director_token, _director_token_expires
+    with _director_lock:
+        # another thread may have refreshed while we waited for the lock
+        if _director_token is not None and _director_token != stale and time.time() < _director_token_expires:
+            return _director_token
+        fetched = _fetch_director_token()
+        if fetched is None:
             return 400
-        name = ""
-        if 'first_name' in resp_parsed["body"][0]:
-            name = name + resp_parsed["body"][0]['first_name']
-        if 'last_name' in resp_parsed["body"][0]:
-            name = name + " " + resp_parsed["body"][0]['last_name']
-        return name
-    else:
-        return 400
+        _director_token, _director_token_expires = fetched
+        return _director_token
+
+
+def _refresh_in_background(stale):
+    global _director_refreshing
+    with _refreshing_lock:
+        if _director_refreshing:
+            return
+        _director_refreshing = True
+
+    def run():
+        global _director_refreshing
+        try:
+            _refresh_director_token(stale)
+        finally:
+            _director_refreshing = False
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def invalidate_director_token(token):
+    global _director_token, _director_token_expires
+    with _director_lock:
+        if _director_token == token:
+            _director_token = None
+            _director_token_expires = 0.0
+
+
+def call_auth_endpoint():
+    token, expires = _director_token, _director_token_expires
+    now = time.time()
+    if token is not None and now < expires:
+        if now >= expires - getattr(config, "DIRECTOR_TOKEN_REFRESH_MARGIN", 300):
+            _refresh_in_background(token)
+        return token
+    return _refresh_director_token(token)
+
+
+def read_request(token, query):
+    return {"email": "teambuilder@hackru.org", "token": token, "query": query}
+
+
+def _read(token, query):
+    data_dic = read_request(token, query)
+    return client.post("/read", data_dic, idempotent=True)
+
+
+def token_rejected(token, resp_parsed):
+    """Whether LCS rejected the director token in a /read response, in which
+    case it is dropped and the caller retries with a fresh one."""
+    if resp_parsed is not None and resp_parsed.get('statusCode') in (401, 403):
+        invalidate_director_token(token)
+        return True
+    return False
+
+
+def read(token, query):
+    """Query LCS /read, retrying once with a fresh director token if LCS
+    rejects the one we have."""
+    resp_parsed = _read(token, query)
+    if token_rejected(token, resp_parsed):
+        token = call_auth_endpoint()
+        if token == 400:
+            return None
+        resp_parsed = _read(token, query)
+    return resp_parsed
+
+
+def _format_name(user):
+    name = ""
+    if 'first_name' in user:
+        name = name + user['first_name']
+    if 'last_name' in user:
+        name = name + " " + user['last_name']
+    return name
+
+
+# email -> display name, or None for emails without an LCS account
+name_cache = TTLCache(
+    maxsize=getattr(config, "NAME_CACHE_SIZE", 10000),
+    ttl=getattr(config, "NAME_CACHE_TTL", 600),
+    name="names",
+)
+_NOT_CACHED = object()
+
+
+def cached_names(emails):
+    """Split emails into ({email: name} known from name_cache, [uncached emails])."""
+    names = {}
+    missing = []
+    for email in dict.fromkeys(emails):
+        name = name_cache.get(email, _NOT_CACHED)
+        if name is _NOT_CACHED:
+            missing.append(email)
+        elif name is not None:
+            names[email] = name
+    return names, missing
+
+
+def names_query(missing):
+    return {"email": {"$in": missing}}
+
+
+def store_names(names, missing, resp_parsed):
+    """Add the names in an LCS /read response for `missing` to names and
+    name_cache, and return names."""
+    if not resp_parsed or resp_parsed.get('statusCode') != 200:
+        return names
+    wanted = set(missing)
+    for user in resp_parsed["body"] or []:
+        email = user.get("email")
+        if email in wanted:
+            names[email] = _format_name(user)
+            name_cache.set(email, names[email])
+    for email in missing:
+        if email not in names:
+            name_cache.set(email, None, getattr(config, "NAME_CACHE_NEGATIVE_TTL", 60))
+    return names
+
+
+def get_names(emails):
+    """Resolve display names for a list of emails with at most one LCS /read.
+
+    Returns {email: name} for the emails that have an LCS account. Names come
+    from name_cache when possible; if LCS can't be reached the uncached emails
+    are simply left out.
+    """
+    names, missing = cached_names(emails)
+    if not missing:
+        return names
+    token = call_auth_endpoint()
+    if token == 400:
+        return names
+    return store_names(names, missing, read(token, names_query(missing)))
+
+
+def read_name_fields(emails):
+    """{email: {"first_name", "last_name"}} for the emails that have an LCS
+    account, from one /read (also refreshing name_cache), or None if LCS
+    couldn't be reached."""
+    emails = list(emails)
+    token = call_auth_endpoint()
+    if token == 400:
+        return None
+    resp_parsed = read(token, names_query(emails))
+    if not resp_parsed or resp_parsed.get('statusCode') != 200:
+        return None
+    store_names({}, emails, resp_parsed)
+    return {
+        user["email"]: {k: user[k] for k in ("first_name", "last_name") if k in user}
+        for user in resp_parsed["body"] or []
+        if user.get("email") in emails
+    }
+
+
+def validate_result(resp_parsed):
+    """200 if LCS accepted the session, None if it gave no answer, else its
+    answer, which rejects the session whatever the statusCode."""
+    if resp_parsed is None:
+        return None
+    if resp_parsed.get("statusCode") == 200:
+        return 200
+    # e.g. {"statusCode":400,"body":"User email not found."} or
+    # {"statusCode": 403, "body": "Permission denied"}
+    return resp_parsed
 
 
 def call_validate_endpoint(email, token):
     data_dic = {"email": email, "token": token}
-    resp = requests.post(config.LCS_BASE_URL + "/validate", json=data_dic)
-    resp_parsed = resp.json()
-    if resp_parsed["statusCode"] == 400:
-        '''{"statusCode":400,"body":"User email not found."}'''
-        return resp_parsed
-    if resp_parsed["statusCode"] == 403:
-        '''{"statusCode": 403, "body": "Permission denied"}'''
-        return resp_parsed
-    if resp_parsed["statusCode"] == 200:
-        return 200
+    return validate_result(client.post("/validate", data_dic, idempotent=True))
 
 
 def login(email, password):
     data_dic = {"email": email, "password": password}
-    resp = requests.post(config.LCS_BASE_URL + "/authorize", json=data_dic)
-    if not resp:
+    resp_parsed = client.post("/authorize", data_dic)
+    if not resp_parsed:
         return 400
-    resp_parsed = resp.json()
-    if resp_parsed['statusCode'] == 200:
+    if resp_parsed.get('statusCode') == 200:
         return resp_parsed['body']["auth"]["token"]
     else:
         return 400
\ No newline at end of file
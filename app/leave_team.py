@@ -1,22 +1,37 @@
 from app.util import return_resp
 from flask import request
-from app.db import coll
+from app.db import bump_open_teams_version, coll, versioned
+from pymongo import ReturnDocument
+from app.recommendations import refresh_team, refresh_user
 from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
 
 
 def leave(email):
     if request.method == "POST":
-        user_in_a_team = coll("users").find_one({"_id": email, "hasateam": True})
-        if not user_in_a_team:
+        user = coll("users").find_one_and_update(
+            {"_id": email, "hasateam": True},
+            {"$set": {"hasateam": False, "team_id": None}},
+            projection={"team_id": 1},
+        )
+        if not user:
             return return_resp(400, "User doesn't have a tram")
-        team_name = coll("teams").find_one({"members": {"$all": [email]}}, {"_id"})[
-            "_id"
-        ]
-        team_size = len(coll("teams").find_one({"_id": team_name})["members"])
-        if team_size == 1:
-            coll("teams").delete_one({"_id": team_name})
-        else:
-            coll("teams").update_one({"_id": team_name}, {"$pull": {"members": email}})
-            coll("teams").update_one({"_id": team_name}, {"$set": {"complete": False}})
-        coll("users").update_one({"_id": email}, {"$set": {"hasateam": False}})
+        team_name = user.get("team_id")
+        if team_name is None:
+            team = coll("teams").find_one({"members": {"$all": [email]}}, {"_id"})
+            if team is None:
+                # hasateam was set with no team listing the user; it's cleared now
+                refresh_user(email)
+                return return_resp(400, "User not in a team")
+            team_name = team["_id"]
+        team = coll("teams").find_one_and_update(
+            {"_id": team_name},
+            versioned({"$pull": {"members": email}, "$set": {"complete": False}}),
+            projection={"members": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if team and not team["members"]:
+            coll("teams").delete_one({"_id": team_name, "members": {"$size": 0}})
+        bump_open_teams_version()
+        refresh_user(email)
+        refresh_team(team_name)
         return return_resp(200, "Success")
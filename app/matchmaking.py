@@ -0,0 +1,129 @@
+"""Global matchmaking: suggest a team for every unteamed hacker in one pass
+("flask matchmake", meant to run from cron), instead of leaving each hacker
+to poll /team-recommendations and express interest team by team.
+
+Every team that is not complete and has fewer than 4 members wants its
+partner skills and prizes covered. Placing a hacker on a team covers the
+wanted terms they share with it, weighted by IDF over the unteamed pool so
+that scarce skills count for more. assign() greedily makes the placement with
+the largest gain in uncovered weight until no placement adds any, never
+filling a team past 4 members; each team's candidates come from a SkillIndex
+over the hackers not yet placed.
+
+Suggestions are written to the placements collection in one bulk write,
+replacing the previous run's, and served by GET /placements.
+"""
+import heapq
+import time
+from collections import deque
+
+from pymongo import DeleteMany, ReplaceOne
+
+from app.db import HAS_OPEN_SLOT, coll
+from app.similarity import SkillIndex, user_terms
+
+MAX_MEMBERS = 4
+# candidates fetched from the index per team at a time
+CANDIDATES = 16
+
+
+def load_pool():
+    """(unteamed users, teams with an open slot), each in one query."""
+    users = list(coll("users").find({"hasateam": False}, {"skills": 1, "prizes": 1, "hasateam": 1}))
+    teams = list(coll("teams").find(HAS_OPEN_SLOT, {"partnerskills": 1, "prizes": 1, "members": 1}))
+    return users, teams
+
+
+def assign(users, teams):
+    """Greedy capacity-constrained placement. Returns {email: (team_id, gain,
+    covered terms)} and the total weight the teams want."""
+    index = SkillIndex(users)
+    weights = {term: index.idf(term) for term in index.terms()}
+    slots = {}
+    wanted = {}
+    for team in teams:
+        slots[team["_id"]] = MAX_MEMBERS - len(team.get("members") or [])
+        wanted[team["_id"]] = user_terms({"skills": team.get("partnerskills"), "prizes": team.get("prizes")})
+    terms_of = {user["_id"]: user_terms(user) for user in users}
+    total = sum(weights.get(t, 0.0) for team_id, terms in wanted.items() if slots[team_id] > 0 for t in terms)
+    candidates = {}
+    heap = []
+
+    def gain(team_id, email):
+        return sum(weights.get(t, 0.0) for t in terms_of[email] & wanted[team_id])
+
+    def push_next(team_id, refill=False):
+        queue = candidates.get(team_id)
+        if refill or not queue:
+            terms = wanted[team_id]
+            found = index.top(
+                [t[2:] for t in terms if t.startswith("s:")], [t[2:] for t in terms if t.startswith("p:")], CANDIDATES
+            )
+            queue = candidates[team_id] = deque(
+                sorted(((gain(team_id, m["_id"]), m["_id"]) for m in found), key=lambda c: (-c[0], c[1]))
+            )
+        while queue:
+            score, email = queue.popleft()
+            if email in index:
+                heapq.heappush(heap, (-score, team_id, email))
+                return
+
+    for team_id in sorted(slots):
+        if slots[team_id] > 0 and wanted[team_id]:
+            push_next(team_id)
+
+    placements = {}
+    while heap:
+        score, team_id, email = heapq.heappop(heap)
+        if email not in index:
+            # placed on another team since; the next candidate's gain for
+            # this team is unchanged
+            push_next(team_id)
+            continue
+        covered = terms_of[email] & wanted[team_id]
+        placements[email] = (team_id, -score, sorted(covered))
+        index.remove_user(email)
+        wanted[team_id] = wanted[team_id] - covered
+        slots[team_id] -= 1
+        if slots[team_id] > 0 and wanted[team_id]:
+            push_next(team_id, refill=True)
+    return placements, total
+
+
+def write_placements(placements, run):
+    """Replace the stored suggestions with these, in one ordered bulk write:
+    upsert this run's, then delete the ones it didn't produce."""
+    ops = [
+        ReplaceOne(
+            {"_id": email},
+            {"team_id": team_id, "score": round(score, 4), "covers": covered, "run": run},
+            upsert=True,
+        )
+        for email, (team_id, score, covered) in placements.items()
+    ]
+    ops.append(DeleteMany({"run": {"$ne": run}}))
+    coll("placements").bulk_write(ops, ordered=True)
+
+
+def matchmake(dry_run=False):
+    """Load the pool, assign it and (unless dry_run) store the result. Returns
+    counts of hackers, teams and placements, the share of wanted term weight
+    covered, and the seconds spent on each step."""
+    start = time.perf_counter()
+    users, teams = load_pool()
+    loaded = time.perf_counter()
+    placements, wanted = assign(users, teams)
+    assigned = time.perf_counter()
+    if not dry_run:
+        write_placements(placements, time.time_ns() // 1000)
+    done = time.perf_counter()
+    return {
+        "hackers": len(users),
+        "teams": len(teams),
+        "placed": len(placements),
+        "teams_filled": len({team_id for team_id, _, _ in placements.values()}),
+        "coverage": sum(score for _, score, _ in placements.values()) / wanted if wanted else 0.0,
+        "load_seconds": loaded - start,
+        "assign_seconds": assigned - loaded,
+        "write_seconds": done - assigned,
+    }
@@ -0,0 +1,117 @@
+"""Prometheus metrics for routes, Mongo commands, LCS calls and caches.
+
+With several gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory before starting gunicorn (gunicorn.conf.py cleans up after dead
+workers); /metrics then aggregates every worker's samples. Without it the
+numbers are for the current process only.
+"""
+import os
+import time
+
+from flask import Response, g, request
+from pymongo import monitoring
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_LATENCY = Histogram(
+    "teamru_request_duration_seconds", "Time spent handling a request", ["route", "method"]
+)
+RESPONSES = Counter(
+    "teamru_responses_total", "Responses by status code", ["route", "method", "status"]
+)
+MONGO_LATENCY = Histogram(
+    "teamru_mongo_command_duration_seconds", "Mongo command round trip time", ["command"]
+)
+MONGO_COMMANDS = Counter(
+    "teamru_mongo_commands_total", "Mongo commands by outcome", ["command", "outcome"]
+)
+LCS_LATENCY = Histogram(
+    "teamru_lcs_request_duration_seconds", "LCS call round trip time", ["endpoint"]
+)
+LCS_CALLS = Counter(
+    "teamru_lcs_requests_total", "LCS calls by outcome", ["endpoint", "outcome"]
+)
+
+BREAKER_STATE = Gauge(
+    "teamru_circuit_breaker_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open", ["breaker"],
+    multiprocess_mode="livemax",
+)
+BREAKER_TRANSITIONS = Counter(
+    "teamru_circuit_breaker_transitions_total", "Circuit breaker state changes", ["breaker", "from_state", "to_state"]
+)
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+CACHE_LOOKUPS = Counter(
+    "teamru_cache_lookups_total", "In-process cache lookups by outcome (hit, miss, coalesced)", ["cache", "outcome"]
+)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_LATENCY.labels(event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMANDS.labels(event.command_name, "ok").inc()
+
+    def failed(self, event):
+        MONGO_LATENCY.labels(event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMANDS.labels(event.command_name, "error").inc()
+
+
+def observe_lcs(endpoint, outcome, seconds):
+    LCS_LATENCY.labels(endpoint).observe(seconds)
+    LCS_CALLS.labels(endpoint, outcome).inc()
+
+
+def observe_lcs_rejected(endpoint):
+    LCS_CALLS.labels(endpoint, "rejected").inc()
+
+
+def observe_breaker(breaker, from_state, to_state):
+    BREAKER_STATE.labels(breaker).set(_BREAKER_STATES[to_state])
+    BREAKER_TRANSITIONS.labels(breaker, from_state, to_state).inc()
+
+
+def observe_cache(cache, outcome):
+    CACHE_LOOKUPS.labels(cache, outcome).inc()
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+
+
+def _after_request(response):
+    started = g.pop("request_started", None)
+    route = _route()
+    if started is not None and route != "/metrics":
+        REQUEST_LATENCY.labels(route, request.method).observe(time.perf_counter() - started)
+        RESPONSES.labels(route, request.method, str(response.status_code)).inc()
+    return response
+
+
+def metrics():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", metrics, methods=["GET"])
@@ -0,0 +1,24 @@
+"""One-shot data migrations, run through the flask CLI (see app/commands.py)."""
+from pymongo import UpdateMany
+from app.db import coll
+
+
+def backfill_team_ids(batch_size=500):
+    """Set users.team_id (and hasateam) from teams.members, and team_id = None
+    for everyone left without a team. Returns the number of users modified."""
+    modified = 0
+    batch = []
+    for team in coll("teams").find({}, {"members": 1}):
+        batch.append(UpdateMany(
+            {"_id": {"$in": team["members"]}},
+            {"$set": {"team_id": team["_id"], "hasateam": True}},
+        ))
+        if len(batch) == batch_size:
+            modified += coll("users").bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        modified += coll("users").bulk_write(batch, ordered=False).modified_count
+    modified += coll("users").update_many(
+        {"team_id": {"$exists": False}}, {"$set": {"team_id": None, "hasateam": False}}
+    ).modified_count
+    return modified
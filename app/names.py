@@ -0,0 +1,111 @@
+"""Hacker display names stored on users documents.
+
+Profiles and team members used to get their names from LCS on every read.
+Now first_name and last_name are copied from LCS into the user's document
+when the profile is created and when the user joins a team, along with
+names_at (when they were read; names LCS doesn't have are stored as ""). The
+read paths format the stored names and only ask LCS (through the cached
+lcs.get_names) for documents that have never had names captured.
+
+refresh_names() ("flask refresh-names", from cron or with --every) re-reads
+names older than NAME_MAX_AGE seconds, and missing ones, in batches.
+"""
+import logging
+import time
+
+from pymongo import UpdateOne
+
+import app.config as config
+from app.db import coll
+from app.lcs import _format_name, get_names, read_name_fields
+
+log = logging.getLogger(__name__)
+
+NAME_FIELDS = ("first_name", "last_name", "names_at")
+NAME_PROJECTION = dict.fromkeys(NAME_FIELDS, 1)
+
+
+def name_set(fields):
+    """$set fields storing a user's names as read from LCS (None for a user
+    LCS has no account for)."""
+    fields = fields or {}
+    return {
+        "first_name": fields.get("first_name", ""),
+        "last_name": fields.get("last_name", ""),
+        "names_at": time.time(),
+    }
+
+
+def lookup_name_sets(emails):
+    """{email: name_set} for emails, from one LCS /read, or {} if LCS
+    couldn't be reached. Write paths merge these into the update they already
+    make."""
+    fields = read_name_fields(emails)
+    if fields is None:
+        return {}
+    return {email: name_set(fields.get(email)) for email in emails}
+
+
+def store_missing_names(email, user):
+    """Capture email's names from LCS if user, their document as the caller
+    last read it (with NAME_PROJECTION), has none yet."""
+    if user is None or "names_at" in user:
+        return
+    names = lookup_name_sets([email]).get(email)
+    if names:
+        coll("users").update_one({"_id": email}, {"$set": names})
+
+
+def pop_names(user):
+    """Remove the stored name fields from a users document before it is
+    returned; responses carry the formatted name instead."""
+    for field in NAME_FIELDS:
+        user.pop(field, None)
+
+
+def stored_name(user):
+    """The display name stored on a users document, or None if it has none."""
+    if "names_at" not in user:
+        return None
+    return _format_name({k: v for k, v in user.items() if k in ("first_name", "last_name") and v})
+
+
+def user_names(emails):
+    """{email: display name} for emails, from their users documents (one
+    query), falling back to LCS for users with no stored names."""
+    names = {}
+    for user in coll("users").find({"_id": {"$in": list(emails)}}, NAME_PROJECTION):
+        name = stored_name(user)
+        if name is not None:
+            names[user["_id"]] = name
+    missing = [email for email in emails if email not in names]
+    if missing:
+        names.update(get_names(missing))
+    return names
+
+
+def stale_names_filter(cutoff):
+    return {"$or": [{"names_at": None}, {"names_at": {"$lt": cutoff}}]}
+
+
+def refresh_names(batch_size=500, max_age=None):
+    """Re-read stale or missing names from LCS, batch_size users per /read,
+    writing each batch back in one bulk write. Stops early if LCS can't be
+    reached. Returns the number of users updated."""
+    if max_age is None:
+        max_age = getattr(config, "NAME_MAX_AGE", 86400)
+    cutoff = time.time() - max_age
+    updated = 0
+    while True:
+        emails = [
+            user["_id"]
+            for user in coll("users").find(stale_names_filter(cutoff), {"_id": 1}).limit(batch_size)
+        ]
+        if not emails:
+            return updated
+        sets = lookup_name_sets(emails)
+        if not sets:
+            log.warning("LCS unreachable, stopping the name refresh after %d users", updated)
+            return updated
+        coll("users").bulk_write([UpdateOne({"_id": email}, {"$set": s}) for email, s in sets.items()], ordered=False)
+        updated += len(sets)
@@ -1,42 +1,113 @@
-from app.util import return_resp
+import re
+from app.util import Page, etag_for, not_modified, page_params, return_resp, stream_resp
 from flask import request
-from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
-from app.db import coll
-
-
-def return_open_teams(search):
-    if search is None:
-        available_teams = coll("teams").find({"complete": False})
-        all_open_teams = []
-        for x in available_teams:
-            all_open_teams.append(x)
-        if not all_open_teams:
-            return return_resp(400, "No open teams")
-        return return_resp(200, all_open_teams)
+from app.schemas import request_body, ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
+from app.cache import TTLCache
+from app.db import coll, open_teams_version
+from app.indexes import SEARCH_INDEX
+from pymongo import ASCENDING
+import app.config as config
+
+_search_index_ready = False
+
+# ETag -> (code, body, extra) of a non-streamed /open-teams response. ETags
+# include the open-teams version, so entries never need invalidating.
+open_teams_cache = TTLCache(
+    maxsize=getattr(config, "RESPONSE_CACHE_SIZE", 1000),
+    ttl=getattr(config, "RESPONSE_CACHE_TTL", 300),
+    name="open_teams",
+)
+
+
+def ensure_search_index():
+    """Text index behind the /open-teams search. Mongo keeps it up to date on
+    every team insert, update and delete; creating it again is a no-op."""
+    global _search_index_ready
+    if not _search_index_ready:
+        coll("teams").create_indexes([SEARCH_INDEX])
+        _search_index_ready = True
+
+
+def search_terms(search):
+    """Split the user's filter into plain word tokens, dropping the quote and
+    minus characters that $text would treat as phrase/negation operators."""
+    return re.findall(r"\w[\w+#.]*", search.strip().lower())
+
+
+def open_teams_query(terms, after):
+    """(filter, projection, sort, skip_through) for a page of open teams.
+    Without search terms the page is an _id range, to be limited to limit + 1."""
+    if not terms:
+        query = {"complete": False}
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        return query, None, [("_id", ASCENDING)], None
+    # relevance-ranked, so the next page starts after the cursor's team
+    return (
+        {"complete": False, "$text": {"$search": " ".join(terms)}},
+        {"score": {"$meta": "textScore"}},
+        [("score", {"$meta": "textScore"}), ("_id", ASCENDING)],
+        after,
+    )
+
+
+def open_teams_etag(version, terms, limit, after, stream):
+    return etag_for("open-teams", version, terms, limit, after, stream)
+
+
+def open_teams_result(page, limit, after):
+    if page.expired:
+        return 401, "Invalid or expired cursor", {}
+    if not page:
+        return 400, "No open teams", {}
+    all_open_teams = list(page)
+    if limit is None and after is None:
+        return 200, all_open_teams, {}
+    return 200, all_open_teams, {"next": page.next}
+
+
+def _open_teams_page(terms, limit, after):
+    if terms:
+        ensure_search_index()
+    query, projection, sort, skip_through = open_teams_query(terms, after)
+    available_teams = coll("teams").find(query, projection).sort(sort)
+    if limit is not None and skip_through is None:
+        available_teams = available_teams.limit(limit + 1)
+    return Page(available_teams, limit, skip_through=skip_through)
+
+
+def return_open_teams(search, limit=None, after=None, stream=False, if_none_match=None):
+    terms = search_terms(search) if search else []
+    etag = open_teams_etag(open_teams_version(), terms, limit, after, stream)
+    if if_none_match is not None and if_none_match.contains(etag):
+        return not_modified(etag)
+    if stream:
+        page = _open_teams_page(terms, limit, after)
+        if page.expired:
+            resp = return_resp(401, "Invalid or expired cursor")
+        else:
+            resp = stream_resp(200, page) if page else return_resp(400, "No open teams")
     else:
-        search = search.strip.lower()
-        available_teams = coll("teams").find({"complete": False, "$or": [
-            {"desc": {"$regex": ".*" + search + ".*"}},
-            {"partnerskills": {"$regex": ".*" + search + ".*"}},
-            {"prizes": {"$regex": ".*" + search + ".*"}}
-        ]
-                                              })
-        all_open_teams = []
-        for x in available_teams:
-            all_open_teams.append(x)
-        if not all_open_teams:
-            return return_resp(400, "No open teams")
-        return return_resp(200, all_open_teams)
-
-
-@ensure_json()
+        code, body, extra = open_teams_cache.get_or_load(
+            etag, lambda: open_teams_result(_open_teams_page(terms, limit, after), limit, after)
+        )
+        resp = return_resp(code, body, **extra)
+    resp.set_etag(etag)
+    return resp
+
+
+@ensure_json("open teams")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("open teams")
 def get_open_teams():
     if request.method == 'GET':
-        data = request.get_json(silent=True)
+        data = request_body()
         if 'filter' not in data or not data['filter']:
             search = None
         else:
             search = data['filter']
-        return return_open_teams(search)
+        try:
+            limit, after = page_params(data)
+        except ValueError as e:
+            return return_resp(401, str(e).capitalize())
+        return return_open_teams(search, limit, after, data.get("stream") is True, request.if_none_match)
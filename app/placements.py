@@ -0,0 +1,19 @@
+from app.util import return_resp
+from app.db import coll, user_team_id
+
+
+def get_placements(email):
+    """Suggestions from the last matchmaking run (app/matchmaking.py): the
+    team suggested for an unteamed hacker, or the hackers suggested for the
+    caller's team, best first."""
+    team_id = user_team_id(email)
+    if team_id is None:
+        placement = coll("placements").find_one({"_id": email}, {"run": 0})
+        if placement is None:
+            return return_resp(400, "No placement found")
+        return return_resp(200, placement)
+    cursor = coll("placements").find({"team_id": team_id}, {"run": 0, "team_id": 0})
+    hackers = list(cursor.sort([("score", -1), ("_id", 1)]))
+    if not hackers:
+        return return_resp(400, "No placement found")
+    return return_resp(200, hackers)
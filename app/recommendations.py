@@ -0,0 +1,244 @@
+"""Precomputed recommendation rows.
+
+The recommendations collection holds one row per unteamed user ("user:<email>",
+ranked open teams) and one per open team ("team:<name>", unteamed hackers
+ranked by app.similarity). Write paths call refresh_user()/refresh_team() and
+a background worker recomputes only the rows affected by that change (a team
+change moves that one team within the users' stored rows). The GET
+endpoints read a row by _id and only fall back to computing it inline when the
+row is missing or older than RECOMMENDATIONS_MAX_STALENESS seconds.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+from pymongo import DeleteOne, UpdateOne
+
+from app.db import coll
+from app.names import NAME_FIELDS
+from app.similarity import top_hackers, update_user
+import app.config as config
+
+log = logging.getLogger(__name__)
+
+
+def row_size():
+    return getattr(config, "RECOMMENDATIONS_ROW_SIZE", 100)
+
+
+def team_recommendations_pipeline(skills, prizes, limit):
+    """Open teams sharing at least one skill or prize with the user, ranked by
+    how many of the user's skills and prizes they list."""
+    return [
+        {"$match": {"complete": False, "$or": [
+            {"partnerskills": {"$in": skills}},
+            {"prizes": {"$in": prizes}},
+        ]}},
+        {"$addFields": {"score": {"$add": [
+            {"$size": {"$setIntersection": [{"$ifNull": ["$partnerskills", []]}, skills]}},
+            {"$size": {"$setIntersection": [{"$ifNull": ["$prizes", []]}, prizes]}},
+        ]}}},
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
+
+
+def compute_team_matches(user):
+    if user.get("hasateam") is True or not user.get("skills"):
+        return None
+    pipeline = team_recommendations_pipeline(user["skills"], user.get("prizes") or [], row_size())
+    return list(coll("teams").aggregate(pipeline))
+
+
+def compute_hacker_matches(team):
+    """The team's ranked hackers as whole users documents (without the stored
+    name fields) plus their score, as before the index, which only keeps
+    skills and prizes."""
+    if team.get("complete") is True or not team.get("partnerskills"):
+        return None
+    ranked = top_hackers(team, row_size())
+    if not ranked:
+        return ranked
+    users = coll("users").find({"_id": {"$in": [m["_id"] for m in ranked]}}, dict.fromkeys(NAME_FIELDS, 0))
+    docs = {user["_id"]: user for user in users}
+    return [dict(docs[m["_id"]], score=m["score"]) for m in ranked if m["_id"] in docs]
+
+
+def _store(row_id, matches):
+    if matches is None:
+        coll("recommendations").delete_one({"_id": row_id})
+    else:
+        coll("recommendations").replace_one(
+            {"_id": row_id}, {"matches": matches, "updated_at": time.time()}, upsert=True
+        )
+    return matches
+
+
+def store_user_row(user):
+    return _store("user:" + user["_id"], compute_team_matches(user))
+
+
+def store_team_row(team):
+    return _store("team:" + team["_id"], compute_hacker_matches(team))
+
+
+def read_row(row_id):
+    """Return the stored matches for row_id, or None if the row is missing or
+    older than the staleness bound."""
+    return fresh_matches(coll("recommendations").find_one({"_id": row_id}))
+
+
+def fresh_matches(row):
+    if not row:
+        return None
+    max_age = getattr(config, "RECOMMENDATIONS_MAX_STALENESS", 300)
+    if time.time() - row.get("updated_at", 0) > max_age:
+        return None
+    return row["matches"]
+
+
+def _user_changed(email):
+    user = coll("users").find_one({"_id": email})
+    update_user(email, user)
+    if user:
+        store_user_row(user)
+    else:
+        _store("user:" + email, None)
+    # teams that listed this user before the change, or may list them now
+    affected = {row["_id"][len("team:"):] for row in coll("recommendations").find(
+        {"_id": {"$regex": "^team:"}, "matches._id": email}, {"_id": 1}
+    )}
+    if user and user.get("hasateam") is not True:
+        affected.update(team["_id"] for team in coll("teams").find(
+            {"complete": False, "$or": [
+                {"partnerskills": {"$in": user.get("skills") or []}},
+                {"prizes": {"$in": user.get("prizes") or []}},
+            ]}, {"_id": 1}
+        ))
+    found = set()
+    for team in coll("teams").find({"_id": {"$in": list(affected)}}):
+        found.add(team["_id"])
+        store_team_row(team)
+    for name in affected - found:
+        _store("team:" + name, None)
+
+
+def team_score(team, user):
+    """The score team_recommendations_pipeline gives team for user."""
+    return (
+        len(set(team.get("partnerskills") or []) & set(user.get("skills") or []))
+        + len(set(team.get("prizes") or []) & set(user.get("prizes") or []))
+    )
+
+
+def patch_matches(matches, team_name, team, score):
+    """A user's stored ranked teams with team_name's entry moved to where
+    score ranks team, or dropped for a score of 0 (or a deleted team). None
+    if a full row would lose or lower the team, since the team that should
+    take its place isn't in the row; the row is recomputed instead."""
+    size = row_size()
+    old = next((m for m in matches if m["_id"] == team_name), None)
+    if old is not None and len(matches) >= size and score < old["score"]:
+        return None
+    patched = [m for m in matches if m["_id"] != team_name]
+    if score:
+        patched.append(dict(team, score=score))
+        patched.sort(key=lambda m: (-m["score"], m["_id"]))
+    return patched[:size]
+
+
+def _team_changed(team_name):
+    team = coll("teams").find_one({"_id": team_name})
+    if team:
+        store_team_row(team)
+    else:
+        _store("team:" + team_name, None)
+    # Patch the stored rows of users the team may rank for, or did, rather
+    # than rerunning their aggregation: one team write can touch thousands of
+    # rows. Users without a row compute it when they next ask.
+    users = {}
+    if team and team.get("complete") is False:
+        users = {user["_id"]: user for user in coll("users").find(
+            {"hasateam": False, "$or": [
+                {"skills": {"$in": team.get("partnerskills") or []}},
+                {"prizes": {"$in": team.get("prizes") or []}},
+            ]}, {"skills": 1, "prizes": 1}
+        )}
+    rows = coll("recommendations").find({"$or": [
+        {"_id": {"$in": ["user:" + email for email in users]}},
+        {"_id": {"$regex": "^user:"}, "matches._id": team_name},
+    ]})
+    ops = []
+    for row in rows:
+        user = users.get(row["_id"][len("user:"):])
+        matches = patch_matches(row["matches"], team_name, team, team_score(team, user) if user else 0)
+        if matches is None:
+            ops.append(DeleteOne({"_id": row["_id"]}))
+        elif matches != row["matches"]:
+            ops.append(UpdateOne({"_id": row["_id"]}, {"$set": {"matches": matches}}))
+    if ops:
+        coll("recommendations").bulk_write(ops, ordered=False)
+
+
+_HANDLERS = {"user": _user_changed, "team": _team_changed}
+_queue = queue.Queue()
+_pending = set()
+_lock = threading.Lock()
+_worker_pid = None
+
+
+def _run(jobs, kind, key):
+    with _lock:
+        _pending.discard((kind, key))
+    try:
+        _HANDLERS[kind](key)
+    except Exception:
+        log.exception("failed to refresh recommendations for %s %s", kind, key)
+    finally:
+        jobs.task_done()
+
+
+def _work(jobs):
+    while True:
+        _run(jobs, *jobs.get())
+
+
+def drain():
+    """Run the queued refreshes in this thread and wait for the one the
+    worker is on. CLI commands call this before exiting, since the daemon
+    worker dies with the process."""
+    jobs = _queue
+    while True:
+        try:
+            kind, key = jobs.get_nowait()
+        except queue.Empty:
+            break
+        _run(jobs, kind, key)
+    jobs.join()
+
+
+def _enqueue(kind, key):
+    global _queue, _worker_pid
+    with _lock:
+        # the worker thread doesn't survive a fork, so start one per process
+        if _worker_pid != os.getpid():
+            _queue = queue.Queue()
+            _pending.clear()
+            threading.Thread(target=_work, args=(_queue,), daemon=True).start()
+            _worker_pid = os.getpid()
+        if (kind, key) in _pending:
+            return
+        _pending.add((kind, key))
+    _queue.put((kind, key))
+
+
+def refresh_user(email):
+    """Schedule a refresh of every row affected by a change to this user."""
+    _enqueue("user", email)
+
+
+def refresh_team(team_name):
+    """Schedule a refresh of every row affected by a change to this team."""
+    _enqueue("team", team_name)
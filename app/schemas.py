@@ -1,38 +1,202 @@
 from functools import wraps
-from flask import request
+from flask import g, request
 from jsonschema import Draft4Validator
 from app.util import return_resp
 from app.lcs import call_validate_endpoint
+from app.cache import TTLCache
 import app.config as config
 
+# (email, token) -> result of call_validate_endpoint. Accepted tokens are kept
+# for VALIDATE_CACHE_TTL seconds and rejected ones for VALIDATE_CACHE_NEGATIVE_TTL;
+# anything else (LCS errors) is not cached.
+validation_cache = TTLCache(
+    maxsize=getattr(config, "VALIDATE_CACHE_SIZE", 10000),
+    ttl=getattr(config, "VALIDATE_CACHE_TTL", 60),
+    name="validation",
+)
+
+
+# (email, token) -> True for sessions LCS accepted within the last
+# LCS_DEGRADED_SESSION_TTL seconds. While LCS can't be reached (or its
+# circuit breaker is open) these are still let in; 0 turns that off.
+recent_sessions = TTLCache(
+    maxsize=getattr(config, "VALIDATE_CACHE_SIZE", 10000),
+    ttl=getattr(config, "LCS_DEGRADED_SESSION_TTL", 3600),
+    name="recent_sessions",
+)
+
+
+def session_result(key, result):
+    """result of validating key with LCS, with the degraded session policy
+    applied: remember accepted sessions, forget rejected ones, and accept a
+    recently accepted one when LCS gave no answer."""
+    if result == 200:
+        recent_sessions.set(key, True)
+    elif result is not None:
+        recent_sessions.pop(key)
+    elif recent_sessions.get(key):
+        return 200
+    return result
+
+
+def _validation_ttl(result):
+    if result == 200:
+        return validation_cache.ttl
+    if isinstance(result, dict) and result.get("statusCode") in (400, 403):
+        return getattr(config, "VALIDATE_CACHE_NEGATIVE_TTL", 10)
+    return None
+
+
+def cache_validation(key, result):
+    """Cache an LCS /validate result for as long as _validation_ttl says."""
+    ttl = _validation_ttl(result)
+    if ttl is not None:
+        validation_cache.set(key, result, ttl)
+
+
+def validate_user(email, token):
+    key = (email, token)
+    return session_result(
+        key, validation_cache.get_or_load(key, lambda: call_validate_endpoint(email, token), _validation_ttl)
+    )
+
+
+def feature_error(feature):
+    """(code, message) to reject a request for a disabled feature, else None."""
+    if config.ENABLE_FEATURE[feature] == 1:
+        return None
+    elif config.ENABLE_FEATURE[feature] == 0:
+        return 501, "Feature is disabled"
+    else:
+        return 502, "Wrong Feature value"
+
+
+def login_fields(data):
+    """(normalized email, token) from a request body, or None if missing."""
+    if not isinstance(data, dict):
+        return None
+    email = data.get("user_email")
+    token = data.get("token")
+    if not email or not isinstance(email, str) or not token or not isinstance(token, str):
+        return None
+    return email.strip().lower(), token
+
+
+_STRING = {"type": "string", "minLength": 1}
+# optional paging fields, as read by util.page_params
+_PAGING = {
+    "limit": {"type": ["integer", "null"], "minimum": 1},
+    "after": {"type": ["string", "null"], "pattern": "^[A-Za-z0-9_-]+={0,2}$"},
+}
+# messages for bad paging fields, overriding the feature's own message
+_FIELD_MESSAGES = {"limit": "Invalid limit", "after": "Invalid cursor", "stream": "Invalid stream"}
+
+# Fields each endpoint takes beyond user_email and token, keyed by feature
+# name, with the (code, message) for a body that doesn't match.
+BODY_SCHEMAS = {
+    "user profile": (
+        {"properties": {"skills": {"type": "string"}, "prizes": {"type": "string"}}},
+        (400, "Invalid profile"),
+    ),
+    "start a team": (
+        {
+            "required": ["name", "desc", "skills"],
+            "properties": {"name": _STRING, "desc": _STRING, "skills": _STRING, "prizes": {"type": "string"}},
+        },
+        (400, "Required info not found"),
+    ),
+    "add team member": (
+        {"required": ["email"], "properties": {"email": _STRING}},
+        (400, "Required info not found"),
+    ),
+    "confirm member": (
+        {"required": ["email"], "properties": {"email": _STRING}},
+        (401, "Missing inf"),
+    ),
+    "interested": (
+        {"required": ["name"], "properties": {"name": _STRING}},
+        (401, "Missing inf"),
+    ),
+    "leave team": ({}, (408, "Missing email or token")),
+    "team complete": ({}, (408, "Missing email or token")),
+    "team profile": ({}, (408, "Missing email or token")),
+    "placements": ({}, (408, "Missing email or token")),
+    "open teams": (
+        {"properties": dict(_PAGING, filter={"type": ["string", "null"]}, stream={"type": ["boolean", "null"]})},
+        (401, "Invalid filter"),
+    ),
+    "team recommendations": ({"properties": _PAGING}, (401, "Invalid limit")),
+    "individual recommendations": ({"properties": _PAGING}, (403, "Invalid limit")),
+    "batch": (
+        {
+            "required": ["operations"],
+            "properties": {"operations": {
+                "type": "array",
+                "minItems": 1,
+                "maxItems": getattr(config, "BATCH_MAX_OPERATIONS", 10),
+                "items": {"type": "object", "required": ["op"], "properties": {"op": {"type": "string"}}},
+            }},
+        },
+        (400, "Invalid batch"),
+    ),
+}
+_body_validators = {
+    feature: (Draft4Validator(dict(schema, type="object")), error)
+    for feature, (schema, error) in BODY_SCHEMAS.items()
+}
+
+
+def request_body():
+    """The current request's JSON body, parsed once per request."""
+    if "body" not in g:
+        g.body = request.get_json(force=True)
+    return g.body
+
+
+def body_error(feature=None, body=None):
+    """(code, message) rejecting the current request body (or `body`), or None.
+
+    Checked before any LCS or Mongo call: the body must be an object with
+    user_email and token, and match the feature's BODY_SCHEMAS entry.
+    """
+    if body is None:
+        body = request_body()
+    if not isinstance(body, dict):
+        return 505, "Invalid Json"
+    if login_fields(body) is None:
+        return 408, "Missing email or token"
+    if feature in _body_validators:
+        validator, error = _body_validators[feature]
+        if not validator.is_valid(body):
+            field = next(iter(validator.iter_errors(body))).path
+            if field and field[0] in _FIELD_MESSAGES:
+                return error[0], _FIELD_MESSAGES[field[0]]
+            return error
+    return None
+
 
 def ensure_feature_is_enabled(feature):
     def inner(fn):
+        @wraps(fn)
         def wrapper():
-            if config.ENABLE_FEATURE[feature] == 1:
+            error = feature_error(feature)
+            if error is None:
                 return fn()
-            elif config.ENABLE_FEATURE[feature] == 0:
-                return return_resp(501, "Feature is disabled")
-            else:
-                return return_resp(502, "Wrong Feature value")
+            return return_resp(*error)
 
         return wrapper
 
     return inner
 
 
-def ensure_json():
-    validator = Draft4Validator({"type": "object"})
-
+def ensure_json(feature=None):
     def wrapper(fn):
         @wraps(fn)
         def wrapped():
-            test_input = request.get_json(force=True)
-            errors = [error.message for error in validator.iter_errors(test_input)]
-            if errors:
-                return return_resp(505, "Invalid Json")
-            else:
-                return fn()
+            error = body_error(feature)
+            if error is not None:
+                return return_resp(*error)
+            return fn()
 
         return wrapped
 
@@ -43,19 +207,11 @@ def ensure_user_logged_in():
     def wrapper(fn):
         @wraps(fn)
         def wrapped():
-            data = request.get_json(force=True)
-            if (
-                not data
-                or "user_email" not in data
-                or not data["user_email"]
-                or "token" not in data
-                or not data["token"]
-            ):
+            fields = login_fields(request_body())
+            if fields is None:
                 return return_resp(408, "Missing email or token")
-            email = data["user_email"]
-            token = data["token"]
-            email = email.strip().lower()
-            if call_validate_endpoint(email, token) != 200:
+            g.user_email, token = fields
+            if validate_user(g.user_email, token) != 200:
                 return return_resp(404, "Invalid request")
             else:
                 return fn()
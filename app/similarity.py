@@ -0,0 +1,287 @@
+"""In-process skill/prize similarity index behind the individual
+recommendations (a team's ranked unteamed hackers).
+
+Unteamed hackers are held as a sparse hacker-by-term matrix: one posting set
+per skill ("s:python") and prize ("p:best ml"). Scoring a team walks the
+postings of its partner skills and prizes and adds each term's IDF weight to
+the hackers listed, which is the product of that matrix with the team's term
+vector, and heapq picks the top k without sorting every candidate.
+
+Each process builds its index from Mongo on first use and rebuilds it in the
+background every SIMILARITY_RELOAD_INTERVAL seconds, so changes written by
+other workers show up within that bound. Builds read Mongo without holding
+the module lock; callers arriving during the first build wait for it rather
+than starting their own. Changes seen by this process's recommendations
+worker are applied right away through update_user().
+"""
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+
+from app.db import coll
+import app.config as config
+
+log = logging.getLogger(__name__)
+
+
+def user_terms(user):
+    return (
+        {"s:" + skill for skill in user.get("skills") or []}
+        | {"p:" + prize for prize in user.get("prizes") or []}
+    )
+
+
+# up to this many distinct query terms, top() ranks exact term-subset groups;
+# beyond it (2**n subsets) it falls back to summing scores per hacker
+EXACT_TERMS = 10
+
+
+def _bits(mask):
+    """Positions of the set bits of mask, ascending."""
+    s = bin(mask)[:1:-1]
+    i = s.find("1")
+    while i != -1:
+        yield i
+        i = s.find("1", i + 1)
+
+
+class SkillIndex:
+    """Unteamed hackers by term. Each hacker has a slot, and each term's
+    posting is an int bitmask of slots, so set algebra over the postings runs
+    a machine word at a time. Not thread-safe on its own; the module
+    functions below serialize access."""
+
+    def __init__(self, users=()):
+        self._postings = {}
+        self._slots = {}
+        self._users = []
+        self._free = []
+        slots = {}
+        for user in users:
+            terms = self._add(user)
+            for term in terms:
+                slots.setdefault(term, []).append(self._slots[user["_id"]])
+        for term, positions in slots.items():
+            mask = bytearray(len(self._users) // 8 + 1)
+            for slot in positions:
+                mask[slot >> 3] |= 1 << (slot & 7)
+            self._postings[term] = int.from_bytes(mask, "little")
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, email):
+        return email in self._slots
+
+    def terms(self):
+        """The terms at least one indexed hacker has."""
+        return self._postings.keys()
+
+    def _add(self, user):
+        terms = user_terms(user)
+        if user.get("hasateam") is True or not terms:
+            return ()
+        doc = {"_id": user["_id"], "skills": user.get("skills") or [], "prizes": user.get("prizes") or []}
+        slot = self._free.pop() if self._free else len(self._users)
+        if slot == len(self._users):
+            self._users.append(None)
+        self._users[slot] = (doc, terms)
+        self._slots[user["_id"]] = slot
+        return terms
+
+    def remove_user(self, email):
+        slot = self._slots.pop(email, None)
+        if slot is None:
+            return
+        clear = ~(1 << slot)
+        for term in self._users[slot][1]:
+            posting = self._postings[term] & clear
+            if posting:
+                self._postings[term] = posting
+            else:
+                del self._postings[term]
+        self._users[slot] = None
+        self._free.append(slot)
+
+    def update_user(self, user):
+        """Index the user's current skills and prizes, or drop them if they
+        are on a team (or have neither)."""
+        self.remove_user(user["_id"])
+        terms = self._add(user)
+        if terms:
+            bit = 1 << self._slots[user["_id"]]
+            for term in terms:
+                self._postings[term] = self._postings.get(term, 0) | bit
+
+    def idf(self, term):
+        df = self._postings[term].bit_count() if term in self._postings else 0
+        return math.log((1 + len(self._slots)) / (1 + df)) + 1
+
+    def top(self, skills, prizes, k):
+        """The k best matches for a team's partner skills and prizes, ranked
+        by score (sum of the IDF weights of shared terms), then _id."""
+        terms = [t for t in user_terms({"skills": skills, "prizes": prizes}) if t in self._postings]
+        if not terms or k <= 0:
+            return []
+        weights = [self.idf(t) for t in terms]
+        if len(terms) > EXACT_TERMS:
+            scored = self._accumulate(terms, weights, k)
+        else:
+            scored = self._by_subset(terms, weights, k)
+        return [dict(self._users[self._slots[email]][0], score=round(score, 4)) for email, score in scored]
+
+    def _by_subset(self, terms, weights, k):
+        # Every hacker's score is the weight of the exact subset of the query
+        # terms they have, so walk subsets from the heaviest down; a subset's
+        # hackers are the AND of its postings minus the OR of the others.
+        masks = [self._postings[t] for t in terms]
+        sums = [0.0] * (1 << len(terms))
+        for subset in range(1, len(sums)):
+            low = subset & -subset
+            sums[subset] = sums[subset ^ low] + weights[low.bit_length() - 1]
+        order = sorted(range(1, len(sums)), key=lambda subset: -sums[subset])
+        scored = []
+        tied = []
+        tied_score = None
+        for subset in order:
+            score = round(sums[subset], 9)
+            if score != tied_score:
+                scored.extend(self._ties(tied, tied_score, k - len(scored)))
+                if len(scored) >= k:
+                    return scored
+                tied, tied_score = [], score
+            group = -1
+            for i, mask in enumerate(masks):
+                group &= mask if subset >> i & 1 else ~mask
+            if group:
+                tied.extend(self._users[slot][0]["_id"] for slot in _bits(group))
+        scored.extend(self._ties(tied, tied_score, k - len(scored)))
+        return scored
+
+    @staticmethod
+    def _ties(emails, score, n):
+        if n <= 0 or not emails:
+            return []
+        best = sorted(emails) if len(emails) <= n else heapq.nsmallest(n, emails)
+        return [(email, score) for email in best]
+
+    def _accumulate(self, terms, weights, k):
+        scores = {}
+        get = scores.get
+        for term, weight in zip(terms, weights):
+            for slot in _bits(self._postings[term]):
+                email = self._users[slot][0]["_id"]
+                scores[email] = get(email, 0.0) + weight
+        # rounded like _by_subset, so summation order can't break ties
+        return heapq.nsmallest(k, scores.items(), key=lambda item: (-round(item[1], 9), item[0]))
+
+
+_index = None
+_index_pid = None
+_loaded_at = 0.0
+_reloading = False
+# set when the first build in this process (_building_pid) finishes
+_building = None
+_building_pid = None
+# users updated while a build was reading Mongo, applied again after it
+_replay = None
+_lock = threading.Lock()
+
+
+def load_index():
+    users = coll("users").find({"hasateam": False}, {"skills": 1, "prizes": 1, "hasateam": 1})
+    return SkillIndex(users)
+
+
+def _reload():
+    global _index, _loaded_at, _reloading, _replay
+    try:
+        index = load_index()
+    except Exception:
+        log.exception("failed to reload the skill index")
+        with _lock:
+            _reloading = False
+            _replay = None
+        return
+    with _lock:
+        for user in (_replay or {}).values():
+            index.update_user(user)
+        _index = index
+        _loaded_at = time.monotonic()
+        _reloading = False
+        _replay = None
+
+
+def _current():
+    """This process's index, building it on first use and starting a
+    background rebuild once it is older than the reload interval. Call
+    without _lock held."""
+    global _index, _index_pid, _loaded_at, _reloading, _replay, _building, _building_pid
+    pid = os.getpid()
+    while True:
+        with _lock:
+            if _index is not None and _index_pid == pid:
+                interval = getattr(config, "SIMILARITY_RELOAD_INTERVAL", 60)
+                if not _reloading and time.monotonic() - _loaded_at > interval:
+                    _reloading = True
+                    _replay = {}
+                    threading.Thread(target=_reload, daemon=True).start()
+                return _index
+            building = _building if _building_pid == pid else None
+            owner = building is None
+            if owner:
+                building = _building = threading.Event()
+                _building_pid = pid
+                _reloading = False
+                _replay = {}
+        if owner:
+            break
+        building.wait()
+    try:
+        index = load_index()
+    except Exception:
+        with _lock:
+            _building = None
+            _replay = None
+        building.set()
+        raise
+    with _lock:
+        for user in _replay.values():
+            index.update_user(user)
+        _index = index
+        _index_pid = pid
+        _loaded_at = time.monotonic()
+        _building = None
+        _replay = None
+    building.set()
+    return index
+
+
+def reset_index():
+    """Drop this process's index; the next lookup rebuilds it from Mongo."""
+    global _index
+    with _lock:
+        _index = None
+
+
+def top_hackers(team, k):
+    """Ranked unteamed hackers for a team: their _id, skills, prizes and
+    score."""
+    index = _current()
+    with _lock:
+        return index.top(team.get("partnerskills") or [], team.get("prizes") or [], k)
+
+
+def update_user(email, user):
+    """Apply a change to one user (their current document, or None if they
+    were deleted) to this process's index, if it has been built."""
+    if user is None:
+        user = {"_id": email, "hasateam": True}
+    with _lock:
+        if _replay is not None:
+            _replay[email] = user
+        if _index is not None and _index_pid == os.getpid():
+            _index.update_user(user)
@@ -1,19 +1,20 @@
+import time
 from app.util import return_resp, format_string
-from flask import request
-from app.db import coll
-from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
+from flask import g, request
+from pymongo.errors import DuplicateKeyError
+from app.db import bump_open_teams_version, coll
+from app.names import lookup_name_sets
+from app.recommendations import refresh_team, refresh_user
+from app.schemas import request_body, ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
 
 
-@ensure_json()
+@ensure_json("start a team")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("start a team")
 def create_team():
     if request.method == 'POST':
-        data = request.get_json(silent=True)
-        email = data['user_email']
-        email = email.strip().lower()
-        if not data or 'name' not in data or 'desc' not in data or 'skills' not in data or not data['name'] or not data['desc'] or not data['skills']:
-            return {"statusCode": 400, "body": "Required info not found"}
+        data = request_body()
+        email = g.user_email
         team_name = data['name'].strip().lower()
         team_desc = data['desc'].strip().lower()
         partner_skills = data['skills']
@@ -22,17 +23,29 @@ def create_team():
         if 'prizes' in data:
             prizes = data['prizes']
             formatted_prizes = format_string(prizes)
-        team_exist = coll("teams").find_one({"_id": str(team_name)})
-        user_exists = coll("users").find_one({"_id": email})
+        user_exists = coll("users").find_one({"_id": email}, {"hasateam": 1, "names_at": 1})
         if not user_exists:
             return return_resp(403, "Invalid user")
-        if team_exist:
+        if user_exists.get("hasateam") is True:
+            return return_resp(402, "User in a team")
+        try:
+            # versions start from the clock so a team re-created under a
+            # deleted team's name never repeats its /team-profile ETags
+            coll("teams").insert_one({"_id": team_name, "members": [email], "desc": team_desc, "partnerskills": formatted_skills, "prizes": formatted_prizes, "complete": False, "interested": [], "version": time.time_ns() // 1000})
+        except DuplicateKeyError:
             return return_resp(401, "Invalid name")
-        else:
-            user_in_a_team = coll("users").find_one({"_id": email, "hasateam": True})
-            if user_in_a_team:
-                return return_resp(402, "User in a team")
-            else:
-                coll("users").update_one({"_id": email}, {"$set": {"hasateam": True}})
-                coll("teams").insert({"_id": team_name, "members": [email], "desc": team_desc, "partnerskills": formatted_skills, "prizes": formatted_prizes, "complete": False, "interested": []})
-                return return_resp(200, "Success")
+        names = {}
+        if "names_at" not in user_exists:
+            names = lookup_name_sets([email]).get(email, {})
+        claimed = coll("users").update_one(
+            {"_id": email, "hasateam": {"$ne": True}},
+            {"$set": {"hasateam": True, "team_id": team_name, **names}},
+        )
+        if claimed.matched_count == 0:
+            coll("teams").delete_one({"_id": team_name})
+            bump_open_teams_version()
+            return return_resp(402, "User in a team")
+        bump_open_teams_version()
+        refresh_user(email)
+        refresh_team(team_name)
+        return return_resp(200, "Success")
@@ -1,25 +1,28 @@
 from app.util import return_resp
-from flask import request
-from app.db import coll
+from flask import g, request
+from app.db import bump_open_teams_version, coll, find_user_team, versioned
+from app.recommendations import refresh_team
 from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
 
 
-@ensure_json()
+@ensure_json("team complete")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("team complete")
 def mark_team_complete():
     if request.method == 'POST':
-        data = request.get_json(silent=True)
-        email = data['user_email']
-        email = email.strip().lower()
-        team = coll("teams").find_one({"members": {"$all": [email]}})
+        email = g.user_email
+        team = find_user_team(email, {"complete": 1})
         if not team:
             return return_resp(401, "User not in a team")
         team_name = team['_id']
         team_complete = team['complete']
         if team_complete is True:
-            coll("teams").update_one({"_id": team_name}, {"$set": {"complete": False}})
+            coll("teams").update_one({"_id": team_name}, versioned({"$set": {"complete": False}}))
+            bump_open_teams_version()
+            refresh_team(team_name)
             return return_resp(200, "False")
         else:
-            coll("teams").update_one({"_id": team_name}, {"$set": {"complete": True}})
+            coll("teams").update_one({"_id": team_name}, versioned({"$set": {"complete": True}}))
+            bump_open_teams_version()
+            refresh_team(team_name)
             return return_resp(200, "True")
@@ -1,31 +1,61 @@
-from app.util import return_resp
-from flask import request
-from app.lcs import call_auth_endpoint, get_name
-from app.db import coll
+from app.util import etag_for, not_modified, return_resp
+from flask import g, request
+from app.cache import TTLCache
+from app.db import find_user_team
+from app.names import user_names
 from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
+import app.config as config
 
+# ETag -> team profile with member names, so an unchanged team skips the
+# name lookup. ETags include the team's version.
+team_profile_cache = TTLCache(
+    maxsize=getattr(config, "RESPONSE_CACHE_SIZE", 1000),
+    ttl=getattr(config, "RESPONSE_CACHE_TTL", 300),
+    name="team_profile",
+)
 
-@ensure_json()
+
+def team_profile_etag(team):
+    return etag_for("team-profile", team["_id"], team.get("version", 0))
+
+
+def names_resolved(team):
+    """False if a member's name couldn't be resolved this time. Such a
+    profile isn't cached and gets no ETag, since the ETag only covers the
+    team's version and a 304 would keep the blank name."""
+    return "" not in team["names"]
+
+
+def profile_cache_ttl(team):
+    return team_profile_cache.ttl if names_resolved(team) else None
+
+
+def add_member_names(team, names):
+    members = team['members']
+    team.update({"names": [names.get(member, "") for member in members]})
+    return team
+
+
+@ensure_json("team profile")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("team profile")
 def get_team_profile():
     if request.method == 'GET':
-        data = request.get_json(silent=True)
-        email = data['user_email']
-        email = email.strip().lower()
-        team = coll("teams").find_one({"members": {"$all": [email]}})
-        if not team:
-            return return_resp(400, "Team Not found")
-        else:
-            members = team['members']
-            members_names = []
-            for member in members:
-                token = call_auth_endpoint()
-                if token == 200:
-                    continue
-                name = get_name(token, member)
-                if name == 200:
-                    continue
-                members_names.append(name)
-                team.update({"names": members_names})
-            return return_resp(200, team)
+        return team_profile(g.user_email, request.if_none_match)
+
+
+def team_profile(email, if_none_match=None):
+    team = find_user_team(email)
+    if not team:
+        return return_resp(400, "Team Not found")
+    else:
+        etag = team_profile_etag(team)
+        if if_none_match is not None and if_none_match.contains(etag):
+            return not_modified(etag)
+        team = team_profile_cache.get_or_load(
+            etag, lambda: add_member_names(team, user_names(team['members'])), profile_cache_ttl
+        )
+        resp = return_resp(200, team)
+        if names_resolved(team):
+            resp.set_etag(etag)
+        return resp
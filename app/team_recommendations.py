@@ -1,48 +1,32 @@
-from app.util import return_resp
+from app.util import Page, return_resp
 from flask import request
 from app.db import coll
+from app.recommendations import read_row, store_user_row
+import app.config as config
 from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
 
 
-def get_team_recommendations(email):
+def get_team_recommendations(email, limit=None, after=None):
     if request.method == "GET":
-        user = coll("users").find_one({"_id": email})
-        if not user:
-            return return_resp(403, "Invalid user")
-        user_in_a_team = coll("users").find_one({"_id": email, "hasateam": True})
-        if user_in_a_team:
-            return return_resp(402, "User in a team")
-        if "skills" not in user or not user["skills"]:
+        paged = limit is not None or after is not None
+        if limit is None:
+            limit = getattr(config, "RECOMMENDATIONS_LIMIT", 50)
+        matches = read_row("user:" + email)
+        if matches is None:
+            user = coll("users").find_one({"_id": email})
+            if not user:
+                return return_resp(403, "Invalid user")
+            if user.get("hasateam") is True:
+                return return_resp(402, "User in a team")
+            if "skills" not in user or not user["skills"]:
+                return return_resp(400, "No recommendations found")
+            matches = store_user_row(user)
+        page = Page(matches, limit, skip_through=after)
+        if page.expired:
+            return return_resp(401, "Invalid or expired cursor")
+        if not page:
             return return_resp(400, "No recommendations found")
-        if "prizes" not in user or not user["prizes"]:
-            prizes = []
-        else:
-            prizes = user["prizes"]
-        skills = user["skills"]
-        names = set()
-        matches = []
-        for skill in skills:
-            match = coll("teams").aggregate(
-                [{"$match": {"complete": False, "partnerskills": {"$all": [skill]}}}]
-            )
-            if not match:
-                continue
-            for m in match:
-                if m["_id"] not in names:
-                    names.add(m["_id"])
-                    matches.append(m)
-
-        for prize in prizes:
-            match = coll("teams").aggregate(
-                [{"$match": {"complete": False, "pries": {"$all": [prize]}}}]
-            )
-            if not match:
-                continue
-            for m in match:
-                if m["_id"] not in names:
-                    names.add(m["_id"])
-                    matches.append(m)
-        if not matches:
-            return return_resp(400, "No recommendations found")
-        else:
+        matches = list(page)
+        if not paged:
             return return_resp(200, matches)
+        return return_resp(200, matches, next=page.next)
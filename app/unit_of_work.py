@@ -0,0 +1,307 @@
+"""Request-scoped identity map and unit of work over app.db.coll.
+
+Inside a request, coll() returns a ScopedCollection that shares one
+UnitOfWork per request:
+
+- find_one({"_id": x}, projection) loads the whole document once per request
+  and answers every later lookup of (collection, x), with any projection,
+  from memory. Concurrent lookups (the /batch thread pool) wait for the
+  first one instead of querying again.
+- Writes made through the collection go straight to Mongo, as before, and
+  drop the cached documents they may touch (the one named by an _id filter,
+  or the whole collection).
+- defer_update() queues an update instead of sending it. Updates queued for
+  the same document are combined into one, and everything queued is written
+  when the request ends (after_request, or teardown if the view failed): one
+  update_one per document, or one bulk_write per collection. Reading or
+  writing a document with queued updates flushes them first. /batch worker
+  threads share the request's unit (use()) and never flush it themselves.
+
+Everything else on the collection (queries by other fields, aggregations)
+passes through untouched. Outside a request (CLI commands, background
+workers) coll() returns the plain collection and defer_update() writes
+immediately. Set UNIT_OF_WORK = False to turn the request scope off.
+"""
+import copy
+import logging
+import threading
+
+from flask import g, has_request_context
+from pymongo import UpdateOne
+
+import app.config as config
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+_UNSUPPORTED = object()
+# operators whose arguments combine by field: later values win
+_LAST_WINS = ("$set", "$unset", "$setOnInsert")
+# array operators whose values are appended with $each
+_APPEND = ("$push", "$addToSet")
+
+
+def _project(doc, projection):
+    """doc with a top-level inclusion/exclusion projection applied, or
+    _UNSUPPORTED for projections this doesn't implement."""
+    if doc is None:
+        return None
+    if projection is None:
+        return copy.deepcopy(doc)
+    if not isinstance(projection, dict):
+        projection = dict.fromkeys(projection, 1)
+    for field, value in projection.items():
+        if "." in field or field.startswith("$") or isinstance(value, dict):
+            return _UNSUPPORTED
+    keep_id = projection.get("_id", 1)
+    included = [f for f, v in projection.items() if v and f != "_id"]
+    if included or (keep_id and projection == {"_id": keep_id}):
+        fields = included + (["_id"] if keep_id else [])
+        return {f: copy.deepcopy(doc[f]) for f in fields if f in doc}
+    return {f: copy.deepcopy(v) for f, v in doc.items() if projection.get(f, 1)}
+
+
+def _id_of(filter):
+    """The _id a filter pins down, or _MISSING if it can match several."""
+    if isinstance(filter, dict) and "_id" in filter and not isinstance(filter["_id"], dict):
+        return filter["_id"]
+    return _MISSING
+
+
+def _fields(update):
+    return {f.split(".")[0] for args in update.values() for f in args}
+
+
+def _overlaps(path, other):
+    """Whether one dotted path is inside the other ("a" and "a.b")."""
+    return path != other and (path.startswith(other + ".") or other.startswith(path + "."))
+
+
+def merge_updates(first, second):
+    """One update document with the effect of first then second, or None if
+    they can't be combined (they touch a field through different operators,
+    or a field and a path inside it through the same one, or use an operator
+    other than $set/$unset/$setOnInsert/$inc/$push/$addToSet)."""
+    merged = {op: dict(args) for op, args in first.items()}
+    for op, args in second.items():
+        if op not in merged:
+            if _fields({op: args}) & _fields(merged):
+                return None
+            merged[op] = dict(args)
+            continue
+        other_ops = {k: v for k, v in merged.items() if k != op}
+        if _fields({op: args}) & _fields(other_ops):
+            return None
+        if any(_overlaps(field, other) for field in args for other in merged[op]):
+            return None
+        for field, value in args.items():
+            if op in _LAST_WINS or field not in merged[op]:
+                merged[op][field] = value
+            elif op == "$inc":
+                merged[op][field] += value
+            elif op in _APPEND:
+                values = []
+                for v in (merged[op][field], value):
+                    if isinstance(v, dict) and set(v) == {"$each"}:
+                        values.extend(v["$each"])
+                    elif isinstance(v, dict) and "$each" in v:
+                        return None
+                    else:
+                        values.append(v)
+                merged[op][field] = {"$each": values}
+            else:
+                return None
+    return merged
+
+
+class UnitOfWork:
+    """Documents read and updates queued during one request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections = {}
+        # (collection, _id) -> whole document (None if it doesn't exist)
+        self._docs = {}
+        self._loading = {}
+        # (collection, _id) -> [[update, upsert], ...], combined where possible
+        self._pending = {}
+
+    def collection(self, coll_name, raw):
+        self._collections.setdefault(coll_name, raw)
+        return ScopedCollection(self, coll_name, raw)
+
+    def find_by_id(self, coll_name, _id, projection=None):
+        key = (coll_name, _id)
+        if key in self._pending:
+            self.flush(key)
+        while True:
+            with self._lock:
+                doc = self._docs.get(key, _MISSING)
+                if doc is not _MISSING:
+                    break
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Lock()
+                    loading.acquire()
+                    owner = True
+                else:
+                    owner = False
+            if not owner:
+                # another thread is loading this document; wait for it
+                with loading:
+                    pass
+                continue
+            try:
+                doc = self._collections[coll_name].find_one({"_id": _id})
+                with self._lock:
+                    self._docs[key] = doc
+            finally:
+                with self._lock:
+                    del self._loading[key]
+                loading.release()
+            break
+        return _project(doc, projection)
+
+    def forget(self, coll_name, _id=_MISSING):
+        """Drop cached documents (one, or the whole collection), first
+        writing any updates queued for them."""
+        with self._lock:
+            keys = [k for k in self._pending if k[0] == coll_name and (_id is _MISSING or k[1] == _id)]
+        if keys:
+            self.flush(*keys)
+        with self._lock:
+            if _id is _MISSING:
+                for key in [k for k in self._docs if k[0] == coll_name]:
+                    del self._docs[key]
+            else:
+                self._docs.pop((coll_name, _id), None)
+
+    def defer_update(self, coll_name, _id, update, upsert=False):
+        key = (coll_name, _id)
+        with self._lock:
+            queued = self._pending.setdefault(key, [])
+            merged = merge_updates(queued[-1][0], update) if queued else None
+            if merged is not None:
+                queued[-1] = [merged, queued[-1][1] or upsert]
+            else:
+                queued.append([update, upsert])
+            self._docs.pop(key, None)
+
+    def flush(self, *keys):
+        """Write the queued updates (for keys, or all of them): one
+        update_one per document, one ordered bulk_write per collection when
+        several documents have updates."""
+        with self._lock:
+            if not keys:
+                keys = list(self._pending)
+            pending = [(key, self._pending.pop(key)) for key in keys if key in self._pending]
+        by_coll = {}
+        for (coll_name, _id), updates in pending:
+            by_coll.setdefault(coll_name, []).extend((_id, update, upsert) for update, upsert in updates)
+        for coll_name, ops in by_coll.items():
+            raw = self._collections[coll_name]
+            if len(ops) == 1:
+                _id, update, upsert = ops[0]
+                raw.update_one({"_id": _id}, update, upsert=upsert)
+            else:
+                raw.bulk_write([UpdateOne({"_id": _id}, update, upsert=upsert) for _id, update, upsert in ops])
+
+
+class ScopedCollection:
+    """A collection whose find_one-by-_id goes through the request's
+    UnitOfWork. Other attributes are the underlying collection's."""
+
+    _WRITES = {
+        "insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one",
+        "delete_many", "find_one_and_update", "find_one_and_replace", "find_one_and_delete", "bulk_write",
+    }
+
+    def __init__(self, unit, coll_name, raw):
+        self._unit = unit
+        self._coll_name = coll_name
+        self._raw = raw
+
+    def find_one(self, filter=None, projection=None, *args, **kwargs):
+        _id = _id_of(filter)
+        if _id is not _MISSING and len(filter) == 1 and not args and not kwargs:
+            doc = self._unit.find_by_id(self._coll_name, _id, projection)
+            if doc is not _UNSUPPORTED:
+                return doc
+        return self._raw.find_one(filter, projection, *args, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self._raw, name)
+        if name not in self._WRITES:
+            return attr
+
+        def write(first=None, *args, **kwargs):
+            if name == "insert_one":
+                _id = first.get("_id", _MISSING) if isinstance(first, dict) else _MISSING
+            else:
+                _id = _id_of(first)
+            self._unit.forget(self._coll_name, _id)
+            try:
+                return attr(first, *args, **kwargs)
+            finally:
+                self._unit.forget(self._coll_name, _id)
+
+        return write
+
+
+def enabled():
+    return getattr(config, "UNIT_OF_WORK", True) and has_request_context()
+
+
+def current():
+    """This request's UnitOfWork, or None outside a request."""
+    if not enabled():
+        return None
+    unit = g.get("unit_of_work")
+    if unit is None:
+        unit = g.unit_of_work = UnitOfWork()
+    return unit
+
+
+def use(unit):
+    """Share unit with a copied request context (a /batch worker thread).
+    The worker's teardown leaves it alone; the request that owns it flushes
+    it when it ends."""
+    if unit is not None:
+        g.unit_of_work = unit
+        g.unit_of_work_borrowed = True
+
+
+def scoped(coll_name, raw):
+    unit = current()
+    return raw if unit is None else unit.collection(coll_name, raw)
+
+
+def defer_update(coll, _id, update, upsert=False):
+    """Queue update for the document coll[_id] until the request ends, or
+    apply it now outside a request. coll comes from app.db.coll."""
+    if isinstance(coll, ScopedCollection):
+        coll._unit.defer_update(coll._coll_name, _id, update, upsert)
+    else:
+        coll.update_one({"_id": _id}, update, upsert=upsert)
+
+
+def _after_request(response):
+    unit = g.get("unit_of_work")
+    if unit is not None:
+        unit.flush()
+    return response
+
+
+def _teardown_request(exc):
+    # a view that raised skips after_request; its queued writes still go out
+    unit = g.pop("unit_of_work", None)
+    if unit is not None and not g.pop("unit_of_work_borrowed", False):
+        try:
+            unit.flush()
+        except Exception:
+            log.exception("failed to flush queued updates")
+
+
+def init_app(app):
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -1,17 +1,18 @@
 from app.util import return_resp
-from app.lcs import call_auth_endpoint, get_name
+from app.lcs import get_names
 from app.db import coll
+from app.names import lookup_name_sets, pop_names, stored_name
+from app.recommendations import refresh_user
 
 
 def get_user_profile(email):
     user_profile = coll("users").find_one({"_id": email})
     if not user_profile:
         return return_resp(200, "User Not found")
-    dir_token = call_auth_endpoint()
-    if dir_token != 400:
-        name = get_name(dir_token, email)
-    else:
-        name = ""
+    name = stored_name(user_profile)
+    if name is None:
+        name = get_names([email]).get(email, "")
+    pop_names(user_profile)
     user_profile.update({"name": name})
     return return_resp(200, user_profile)
 
@@ -23,11 +24,15 @@ def create_user_profile(email, **kwargs):
     prizes = kwargs["prizes"]
     skills = kwargs["skills"]
 
-    user_exists = coll("users").find_one({"_id": email})
+    user_exists = coll("users").find_one({"_id": email}, {"names_at": 1})
+    names = {}
+    if not user_exists or "names_at" not in user_exists:
+        names = lookup_name_sets([email]).get(email, {})
     if user_exists:
-        coll("users").update(
-            {"_id": email}, {"$set": {"skills": skills, "prizes": prizes}}
+        coll("users").update_one(
+            {"_id": email}, {"$set": {"skills": skills, "prizes": prizes, **names}}
         )
+        refresh_user(email)
         return return_resp(200, "Successful update")
     else:
         coll("users").insert_one(
@@ -36,7 +41,10 @@ def create_user_profile(email, **kwargs):
                 "skills": skills,
                 "prizes": prizes,
                 "hasateam": False,
+                "team_id": None,
                 "potentialteams": [],
+                **names,
             }
         )
+        refresh_user(email)
         return return_resp(201, "Profile created")
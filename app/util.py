@@ -1,4 +1,8 @@
-from flask import jsonify
+import base64
+import hashlib
+import json
+
+from flask import current_app, jsonify, stream_with_context
 
 
 def format_string(s):
@@ -10,7 +14,102 @@ def format_string(s):
     return elements
 
 
-def return_resp(code, body):
-    resp = jsonify({"statusCode": code, "body": body})
+def return_resp(code, body, **extra):
+    resp = jsonify({"statusCode": code, "body": body, **extra})
     resp.status_code = code
     return resp
+
+
+def stream_resp(code, page):
+    """Like return_resp(code, list(page), next=page.next), but serializes the
+    documents one at a time as the page is iterated."""
+
+    def generate():
+        def dumps(obj):
+            return current_app.json.dumps(obj, separators=(",", ":"))
+
+        yield '{"body":['
+        for i, doc in enumerate(page):
+            yield ("," if i else "") + dumps(doc)
+        yield '],"next":%s,"statusCode":%d}\n' % (dumps(page.next), code)
+
+    resp = current_app.response_class(stream_with_context(generate()), mimetype="application/json")
+    resp.status_code = code
+    return resp
+
+
+def etag_for(*parts):
+    """ETag for a response fully determined by parts (versions, parameters)."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def not_modified(etag):
+    resp = current_app.response_class(status=304)
+    resp.set_etag(etag)
+    return resp
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps(last_id).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError("invalid cursor")
+
+
+def page_params(data):
+    """Read the optional "limit" and "after" paging fields of a request body.
+
+    Returns (limit, after) with after already decoded to an _id; raises
+    ValueError if either is malformed.
+    """
+    limit = data.get("limit")
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+        raise ValueError("invalid limit")
+    after = data.get("after")
+    if after is not None:
+        after = decode_cursor(after)
+    return limit, after
+
+
+class Page:
+    """At most `limit` documents of an _id-keyed cursor or list.
+
+    If `skip_through` is given, documents up to and including the one with that
+    _id are skipped first (for ranked lists, where the next page can't be
+    expressed as an _id range query); `expired` is True if no document had
+    that _id, so the cursor no longer points anywhere in the list. After
+    iteration, `next` holds the cursor for the following page, or None if
+    this was the last one.
+    """
+
+    def __init__(self, docs, limit=None, skip_through=None):
+        self.limit = limit
+        self.next = None
+        self.expired = False
+        self._docs = iter(docs)
+        if skip_through is not None:
+            self.expired = True
+            for doc in self._docs:
+                if doc["_id"] == skip_through:
+                    self.expired = False
+                    break
+        self._first = next(self._docs, None)
+
+    def __bool__(self):
+        return self._first is not None
+
+    def __iter__(self):
+        doc = self._first
+        count = 0
+        while doc is not None:
+            if self.limit is not None and count == self.limit:
+                self.next = encode_cursor(last_id)
+                return
+            yield doc
+            last_id = doc["_id"]
+            count += 1
+            doc = next(self._docs, None)
@@ -1,4 +1,4 @@
-from flask import request
+from flask import g, request
 from app import app
 from app.user_profile import get_user_profile, create_user_profile
 from app.start_a_team import create_team
@@ -11,19 +11,23 @@ from app.team_complete import mark_team_complete
 from app.open_teams import get_open_teams
 from app.team_profile import get_team_profile
 from app.interested import user_interested
+from app.batch import run_batch
+from app.placements import get_placements
+import app.async_views as async_views
+from app.async_views import serve_async
 
-from app.util import format_string, return_resp
-from app.schemas import ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
+from app.util import format_string, page_params, return_resp
+from app.schemas import request_body, ensure_json, ensure_user_logged_in, ensure_feature_is_enabled
 
 
 @app.route("/user-profile", methods=["GET", "POST"])
-@ensure_json()
+@serve_async(async_views.user_profile, "user profile")
+@ensure_json("user profile")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("user profile")
 def user_profile():
-    data = request.get_json(silent=True)
-    email = data["user_email"]
-    email = email.strip().lower()
+    data = request_body()
+    email = g.user_email
     if request.method == "GET":
         return get_user_profile(email)
     elif request.method == "POST":
@@ -42,14 +46,11 @@ def start_a_team():
 
 
 @app.route("/leave-team", methods=["POST"])
-@ensure_json()
+@ensure_json("leave team")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("leave team")
 def leave_team():
-    data = request.get_json(silent=True)
-    email = data["user_email"]
-    email = email.strip().lower()
-    return leave(email)
+    return leave(g.user_email)
 
 
 @app.route("/add-team-member", methods=["POST"])
@@ -63,51 +64,71 @@ def team_complete():
 
 
 @app.route("/open-teams", methods=["GET"])
+@serve_async(async_views.open_teams, "open teams")
 def open_teams():
     return get_open_teams()
 
 
 @app.route("/team-profile", methods=["GET"])
+@serve_async(async_views.team_profile, "team profile")
 def team_profile():
     return get_team_profile()
 
 
 @app.route("/team-recommendations", methods=["GET"])
-@ensure_json()
+@serve_async(async_views.team_recommendations, "team recommendations")
+@ensure_json("team recommendations")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("team recommendations")
 def team_recommendations():
-    data = request.get_json(silent=True)
-    email = data["user_email"]
-    email = email.strip().lower()
-    return get_team_recommendations(email)
+    data = request_body()
+    email = g.user_email
+    try:
+        limit, after = page_params(data)
+    except ValueError as e:
+        return return_resp(401, str(e).capitalize())
+    return get_team_recommendations(email, limit, after)
 
 
 @app.route("/individual-recommendations", methods=["GET"])
-@ensure_json()
+@serve_async(async_views.individual_recommendations, "individual recommendations")
+@ensure_json("individual recommendations")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("individual recommendations")
 def individual_recommendations():
-    data = request.get_json(silent=True)
-    email = data["user_email"]
-    email = email.strip().lower()
-    return get_individual_recommendations(email)
+    data = request_body()
+    email = g.user_email
+    try:
+        limit, after = page_params(data)
+    except ValueError as e:
+        return return_resp(403, str(e).capitalize())
+    return get_individual_recommendations(email, limit, after)
 
 
 @app.route("/interested", methods=["POST"])
-@ensure_json()
+@ensure_json("interested")
 @ensure_user_logged_in()
 @ensure_feature_is_enabled("interested")
 def interested():
-    data = request.get_json(silent=True)
-    email = data["user_email"]
-    email = email.strip().lower()
-    if not data or "name" not in data or not data["name"]:
-        return return_resp(401, "Missing inf")
-    name = data["name"]
-    return user_interested(email, name)
+    return user_interested(g.user_email, request_body()["name"])
 
 
 @app.route("/confirm-member", methods=["POST"])
 def confirm_member():
     return confirm()
+
+
+@app.route("/placements", methods=["GET"])
+@ensure_json("placements")
+@ensure_user_logged_in()
+@ensure_feature_is_enabled("placements")
+def placements():
+    return get_placements(g.user_email)
+
+
+@app.route("/batch", methods=["GET"])
+@ensure_json("batch")
+@ensure_user_logged_in()
+def batch():
+    data = request_body()
+    return return_resp(200, run_batch(g.user_email, data["token"], data["operations"]))
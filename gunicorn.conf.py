@@ -0,0 +1,11 @@
+# gunicorn reads this file automatically. With PROMETHEUS_MULTIPROC_DIR set,
+# every worker writes its metrics there and /metrics (app/metrics.py) adds
+# them up; drop the files of workers that exit so they aren't counted twice.
+import os
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
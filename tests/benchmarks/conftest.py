@@ -0,0 +1,328 @@
+"""Fixtures for the endpoint benchmarks.
+
+The app runs in-process behind the Flask test client. LCS is replaced by a
+local HTTP stub (fake_lcs) and Mongo by mongomock, or by a real mongod when
+BENCH_MONGO_URI is set. Every request is timed and its Mongo commands and
+LCS calls are counted; the numbers are printed at the end of the run and
+written to BENCH_REPORT (JSON) if that is set.
+
+    BENCH_SIZES=100,1000,10000,50000 BENCH_LCS_LATENCY_MS=20 python -m pytest tests/benchmarks
+"""
+import importlib
+import json
+import os
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from pymongo import monitoring
+
+import app.config as config
+import app.db as db
+import app.lcs as lcs
+import app.schemas as schemas
+import app.similarity as similarity
+from app.open_teams import open_teams_cache
+from app.team_profile import team_profile_cache
+from seed_data import seed
+
+DIRECTOR_TOKEN = "director-token"
+USER_TOKEN = "good-token"
+
+SIZES = [int(size) for size in os.environ.get("BENCH_SIZES", "100").split(",")]
+ITERATIONS = int(os.environ.get("BENCH_ITERATIONS", "20"))
+
+results = defaultdict(list)
+recommendations = importlib.import_module("app.recommendations")
+# the real one; the mongo fixture stubs it out under mongomock
+_enqueue = recommendations._enqueue
+
+
+class FakeLcs:
+    """Just enough of LCS for the app: /authorize, /validate and /read."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        # set to a 5xx to simulate an outage
+        self.status = 200
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive, like the real LCS behind its load balancer
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake.lock:
+                    fake.calls[self.path] += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                payload = json.dumps(fake.handle(self.path, body)).encode()
+                self.send_response(fake.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:%d" % self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def handle(self, path, body):
+        if path == "/authorize":
+            valid_until = (datetime.now(timezone.utc) + timedelta(days=3)).isoformat()
+            return {"statusCode": 200, "body": {"auth": {"token": DIRECTOR_TOKEN, "valid_until": valid_until}}}
+        if path == "/validate":
+            if body.get("token") == USER_TOKEN:
+                return {"statusCode": 200, "body": "Successful request."}
+            return {"statusCode": 403, "body": "Permission denied"}
+        if path == "/read":
+            if body.get("token") != DIRECTOR_TOKEN:
+                return {"statusCode": 403, "body": "Permission denied"}
+            email = body["query"]["email"]
+            emails = email["$in"] if isinstance(email, dict) else [email]
+            return {"statusCode": 200, "body": [
+                {"email": e, "first_name": e.split("@")[0], "last_name": "Hacker"} for e in emails
+            ]}
+        return {"statusCode": 404, "body": "Not found"}
+
+    def total(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        # a cursor's getMore/killCursors belong to the query that opened it
+        if event.command_name not in ("getMore", "killCursors", "endSessions"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class CountingCollection:
+    """mongomock doesn't emit command events, so count the calls instead."""
+
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def counted(*args, **kwargs):
+            self._counter.count += 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+
+class CountingDatabase:
+    def __init__(self, database, counter):
+        self._database = database
+        self._counter = counter
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self._counter)
+
+
+class CountingClient:
+    def __init__(self, client, counter):
+        self._client = client
+        self._counter = counter
+
+    def get_database(self):
+        return CountingDatabase(self._client.get_database(), self._counter)
+
+
+@pytest.fixture(scope="session")
+def fake_lcs():
+    server = FakeLcs(latency=float(os.environ.get("BENCH_LCS_LATENCY_MS", "0")) / 1000)
+    config.LCS_BASE_URL = server.url
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    counter = CommandCounter()
+    if os.environ.get("BENCH_MONGO_URI"):
+        from pymongo import MongoClient
+
+        client = MongoClient(os.environ["BENCH_MONGO_URI"], event_listeners=[counter])
+        client.drop_database(client.get_database().name)
+        patched = client
+    else:
+        import mongomock
+
+        client = mongomock.MongoClient(config.DB_URI)
+        patched = CountingClient(client, counter)
+        # the recommendation pipelines use operators mongomock doesn't
+        # implement, so rows are seeded directly instead of by the worker
+        monkeypatch.setattr("app.recommendations._enqueue", lambda kind, key: None)
+    db._collections.clear()
+    # response caches are keyed on versions that restart with the database
+    open_teams_cache.clear()
+    team_profile_cache.clear()
+    similarity.reset_index()
+    monkeypatch.setattr(db, "get_client", lambda: patched)
+    yield counter
+    db._collections.clear()
+    if os.environ.get("BENCH_MONGO_URI"):
+        client.drop_database(client.get_database().name)
+    client.close()
+
+
+@pytest.fixture
+def refresh_worker(mongo, monkeypatch):
+    """Let write paths queue recommendation refreshes for real; call
+    recommendations.drain() to wait for them."""
+    monkeypatch.setattr(recommendations, "_enqueue", _enqueue)
+    yield recommendations
+    recommendations.drain()
+
+
+@pytest.fixture(params=SIZES, ids=lambda size: "n%d" % size)
+def dataset(request, mongo, fake_lcs):
+    size = request.param
+    seed(size, rows=ITERATIONS)
+    mongo.count = 0
+    return size
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length=None):
+        return list(self._cursor)
+
+
+class AsyncCollection:
+    """The part of the AsyncMongoClient collection API app.aio uses, over
+    app.db.coll (so mongomock works and commands are counted)."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return self._collection.find_one(*args, **kwargs)
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+
+@pytest.fixture(params=["sync", "async"])
+def mode(request, monkeypatch):
+    """Every endpoint test runs once as is and once with ASYNC_MODE on."""
+    if request.param == "async":
+        import app.aio as aio
+
+        monkeypatch.setattr(config, "ASYNC_MODE", True)
+        if not os.environ.get("BENCH_MONGO_URI"):
+            monkeypatch.setattr(aio, "acoll", lambda coll_name: AsyncCollection(db.coll(coll_name)))
+    return request.param
+
+
+@pytest.fixture
+def client(fake_lcs, mode):
+    from app import app
+
+    return app.test_client()
+
+
+@pytest.fixture
+def bench(mongo, fake_lcs, client, dataset, mode):
+    """bench(name, method, path, body_for) sends ITERATIONS requests built by
+    body_for(i) and records latency and Mongo/LCS round trips per request.
+    The validation and name caches are cleared before each one so every
+    request pays for its own LCS calls."""
+
+    def run(name, method, path, body_for, expect=(200, 201)):
+        samples = []
+        # the director token is long-lived, so start from the steady state
+        lcs.call_auth_endpoint()
+        for i in range(ITERATIONS):
+            schemas.validation_cache.clear()
+            lcs.name_cache.clear()
+            body = dict(body_for(i), token=USER_TOKEN)
+            mongo_before, lcs_before = mongo.count, fake_lcs.total()
+            start = time.perf_counter()
+            resp = client.open(path, method=method, json=body)
+            resp.get_data()
+            elapsed = time.perf_counter() - start
+            assert resp.status_code in expect, (name, i, resp.get_json())
+            samples.append((elapsed, mongo.count - mongo_before, fake_lcs.total() - lcs_before))
+        results[(name if mode == "sync" else name + " (async)", dataset)] = samples
+        return {
+            "mongo": max(s[1] for s in samples),
+            "lcs": max(s[2] for s in samples),
+        }
+
+    return run
+
+
+@pytest.fixture
+def record():
+    """record(name, size, latencies) adds timings of something other than a
+    request to the report, with no round trips."""
+
+    def add(name, size, latencies):
+        results[(name, size)] = [(elapsed, 0, 0) for elapsed in latencies]
+
+    return add
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not results:
+        return
+    report = []
+    terminalreporter.write_sep("-", "endpoint benchmarks")
+    terminalreporter.write_line("%-28s %7s %9s %9s %7s %7s" % ("endpoint", "n", "mean ms", "p95 ms", "mongo", "lcs"))
+    for (name, size), samples in sorted(results.items()):
+        latencies = sorted(s[0] * 1000 for s in samples)
+        row = {
+            "endpoint": name,
+            "size": size,
+            "mean_ms": statistics.mean(latencies),
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "mongo_commands": statistics.mean(s[1] for s in samples),
+            "lcs_calls": statistics.mean(s[2] for s in samples),
+        }
+        report.append(row)
+        terminalreporter.write_line("%-28s %7d %9.2f %9.2f %7.1f %7.1f" % (
+            name, size, row["mean_ms"], row["p95_ms"], row["mongo_commands"], row["lcs_calls"]))
+    if os.environ.get("BENCH_REPORT"):
+        with open(os.environ["BENCH_REPORT"], "w") as f:
+            json.dump(report, f, indent=2)
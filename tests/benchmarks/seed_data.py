@@ -0,0 +1,74 @@
+import time
+
+from app.db import coll
+
+SKILLS = ["python", "javascript", "react", "go", "rust", "java", "c++", "sql", "ml", "design"]
+PRIZES = ["best hack", "best design", "best ml", "best beginner", "sponsor a", "sponsor b"]
+
+
+def email(i):
+    return "hacker%d@example.com" % i
+
+
+def seed(size, rows=20):
+    """size users; the first half are in teams of two (size // 4 teams, every
+    fourth one complete), the second half are unteamed. Recommendation rows are
+    stored for the first `rows` unteamed users and open teams."""
+    users = []
+    teams = []
+    for i in range(size):
+        team_id = "team%d" % (i // 2) if i < size // 2 else None
+        users.append({
+            "_id": email(i),
+            "skills": [SKILLS[i % len(SKILLS)], SKILLS[(i * 7) % len(SKILLS)]],
+            "prizes": [PRIZES[i % len(PRIZES)]],
+            "hasateam": team_id is not None,
+            "team_id": team_id,
+            "potentialteams": [],
+            # as captured from the fake LCS at profile creation
+            "first_name": "hacker%d" % i,
+            "last_name": "Hacker",
+            "names_at": time.time(),
+        })
+    for k in range(size // 4):
+        teams.append({
+            "_id": "team%d" % k,
+            "members": [email(2 * k), email(2 * k + 1)],
+            "desc": "we build %s things" % SKILLS[k % len(SKILLS)],
+            "partnerskills": [SKILLS[k % len(SKILLS)], SKILLS[(k + 3) % len(SKILLS)]],
+            "prizes": [PRIZES[k % len(PRIZES)]],
+            "complete": k % 4 == 0,
+            "interested": [],
+        })
+    coll("users").insert_many(users)
+    coll("teams").insert_many(teams)
+    seed_recommendation_rows(users, teams, rows)
+    return users, teams
+
+
+def seed_recommendation_rows(users, teams, count):
+    """Rows as the recommendations worker would have left them."""
+    def overlap(a, b):
+        return len(set(a) & set(b))
+
+    open_teams = [t for t in teams if not t["complete"]]
+    free = [u for u in users if not u["hasateam"]]
+    rows = []
+    for user in free[:count]:
+        matches = sorted(
+            (dict(t, score=overlap(t["partnerskills"], user["skills"]) + overlap(t["prizes"], user["prizes"]))
+             for t in open_teams),
+            key=lambda t: (-t["score"], t["_id"]),
+        )
+        rows.append({"_id": "user:" + user["_id"], "matches": [t for t in matches if t["score"]][:100],
+                     "updated_at": time.time()})
+    for team in open_teams[:count]:
+        matches = sorted(
+            (dict(u, score=overlap(u["skills"], team["partnerskills"]) + overlap(u["prizes"], team["prizes"]))
+             for u in free),
+            key=lambda u: (-u["score"], u["_id"]),
+        )
+        rows.append({"_id": "team:" + team["_id"], "matches": [u for u in matches if u["score"]][:100],
+                     "updated_at": time.time()})
+    if rows:
+        coll("recommendations").insert_many(rows)
@@ -0,0 +1,28 @@
+import random
+import time
+
+from app.matchmaking import assign
+from seed_data import PRIZES, SKILLS, email
+
+HACKERS = 10000
+TEAMS = 3000
+
+
+def test_assign_10k(record):
+    """Placing 10k hackers on 3k open teams (a couple of seconds; reported,
+    not asserted)."""
+    rng = random.Random(3)
+    skills = SKILLS + ["skill%d" % i for i in range(40)]
+    users = [{
+        "_id": email(i), "skills": rng.sample(SKILLS, 2) + rng.sample(skills, 2),
+        "prizes": rng.sample(PRIZES, 2), "hasateam": False,
+    } for i in range(HACKERS)]
+    teams = [{
+        "_id": "team%d" % i, "partnerskills": rng.sample(skills, 4), "prizes": rng.sample(PRIZES, 2),
+        "members": ["member"] * rng.randint(1, 3),
+    } for i in range(TEAMS)]
+    start = time.perf_counter()
+    placements, total = assign(users, teams)
+    elapsed = time.perf_counter() - start
+    record("matchmaking assign", HACKERS, [elapsed])
+    assert placements and sum(gain for _, gain, _ in placements.values()) <= total + 1e-6
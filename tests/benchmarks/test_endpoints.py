@@ -0,0 +1,505 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from seed_data import email
+
+USER_TOKEN = "good-token"
+
+# Upper bounds on round trips per request (with cold validation and name
+# caches). A change that adds a query or an LCS call to a route fails here.
+# Team writes include bumping the open-teams version; reads use the names
+# stored on users documents.
+BUDGETS = {
+    "GET /user-profile": {"mongo": 1, "lcs": 1},
+    "POST /user-profile": {"mongo": 2, "lcs": 1},
+    "POST /start-a-team": {"mongo": 4, "lcs": 1},
+    "POST /leave-team": {"mongo": 3, "lcs": 1},
+    "POST /add-team-member": {"mongo": 3, "lcs": 2},
+    "POST /team-complete": {"mongo": 4, "lcs": 1},
+    "GET /open-teams": {"mongo": 2, "lcs": 1},
+    "GET /open-teams?limit": {"mongo": 2, "lcs": 1},
+    "GET /open-teams?stream": {"mongo": 2, "lcs": 1},
+    "GET /open-teams?filter": {"mongo": 3, "lcs": 1},
+    "GET /team-profile": {"mongo": 3, "lcs": 1},
+    "GET /team-recommendations": {"mongo": 1, "lcs": 1},
+    "GET /individual-recommendations": {"mongo": 3, "lcs": 1},
+    "POST /interested": {"mongo": 3, "lcs": 1},
+    "POST /confirm-member": {"mongo": 3, "lcs": 1},
+}
+
+
+def open_team_members(size):
+    """email of the first member of every open (not complete) seeded team"""
+    return [email(2 * k) for k in range(size // 4) if k % 4]
+
+
+def free_user(size, i):
+    return email(size // 2 + i)
+
+
+def check(name, counts):
+    budget = BUDGETS[name]
+    assert counts["mongo"] <= budget["mongo"], (name, counts)
+    assert counts["lcs"] <= budget["lcs"], (name, counts)
+
+
+def test_get_user_profile(bench, dataset):
+    check("GET /user-profile", bench("GET /user-profile", "GET", "/user-profile",
+                                     lambda i: {"user_email": email(i)}))
+
+
+def test_post_user_profile(bench, dataset):
+    check("POST /user-profile", bench("POST /user-profile", "POST", "/user-profile",
+                                      lambda i: {"user_email": free_user(dataset, i), "skills": "python, go",
+                                                 "prizes": "best hack"}))
+
+
+def test_start_a_team(bench, dataset):
+    check("POST /start-a-team", bench("POST /start-a-team", "POST", "/start-a-team",
+                                      lambda i: {"user_email": free_user(dataset, i), "name": "new team %d" % i,
+                                                 "desc": "a new team", "skills": "python, react"}))
+
+
+def test_leave_team(bench, dataset):
+    check("POST /leave-team", bench("POST /leave-team", "POST", "/leave-team",
+                                    lambda i: {"user_email": email(2 * i + 1)}))
+
+
+def test_add_team_member(bench, dataset):
+    callers = open_team_members(dataset)
+    check("POST /add-team-member", bench("POST /add-team-member", "POST", "/add-team-member",
+                                         lambda i: {"user_email": callers[i % len(callers)],
+                                                    "email": free_user(dataset, i)},
+                                         expect=(200, 403)))
+
+
+def test_team_complete(bench, dataset):
+    check("POST /team-complete", bench("POST /team-complete", "POST", "/team-complete",
+                                       lambda i: {"user_email": email(2 * i)}))
+
+
+@pytest.mark.parametrize("name, extra", [
+    ("GET /open-teams", {}),
+    ("GET /open-teams?limit", {"limit": 20}),
+    ("GET /open-teams?stream", {"stream": True}),
+    ("GET /open-teams?filter", {"filter": "python"}),
+])
+def test_open_teams(bench, dataset, name, extra):
+    if "filter" in extra and not os.environ.get("BENCH_MONGO_URI"):
+        pytest.skip("mongomock has no $text support")
+    check(name, bench(name, "GET", "/open-teams", lambda i: dict(extra, user_email=email(i))))
+
+
+def test_team_profile(bench, dataset):
+    check("GET /team-profile", bench("GET /team-profile", "GET", "/team-profile",
+                                     lambda i: {"user_email": email(2 * i)}))
+
+
+def test_team_recommendations(bench, dataset):
+    check("GET /team-recommendations", bench("GET /team-recommendations", "GET", "/team-recommendations",
+                                             lambda i: {"user_email": free_user(dataset, i)}))
+
+
+def test_individual_recommendations(bench, dataset):
+    callers = open_team_members(dataset)
+    check("GET /individual-recommendations", bench(
+        "GET /individual-recommendations", "GET", "/individual-recommendations",
+        lambda i: {"user_email": callers[i % len(callers)]}))
+
+
+def test_interested(bench, dataset):
+    teams = ["team%d" % k for k in range(dataset // 4) if k % 4]
+    check("POST /interested", bench("POST /interested", "POST", "/interested",
+                                    lambda i: {"user_email": free_user(dataset, i), "name": teams[i % len(teams)]}))
+
+
+def test_confirm_member(bench, dataset):
+    callers = open_team_members(dataset)
+    check("POST /confirm-member", bench("POST /confirm-member", "POST", "/confirm-member",
+                                        lambda i: {"user_email": callers[i % len(callers)],
+                                                   "email": free_user(dataset, i)},
+                                        expect=(200, 402)))
+
+
+@pytest.mark.parametrize("path, body, code", [
+    ("/start-a-team", {"name": "team x", "desc": "", "skills": "python"}, 400),
+    ("/start-a-team", {"name": "team x", "desc": "d", "skills": ["python"]}, 400),
+    ("/add-team-member", {}, 400),
+    ("/confirm-member", {"email": 7}, 401),
+    ("/interested", {"name": ""}, 401),
+    ("/leave-team", {"user_email": ["a@b.c"]}, 408),
+])
+def test_invalid_bodies_make_no_round_trips(client, mongo, fake_lcs, path, body, code):
+    lcs_before = fake_lcs.total()
+    resp = client.post(path, json=dict({"user_email": email(0), "token": "any"}, **body))
+    assert resp.status_code == code, resp.get_json()
+    assert mongo.count == 0
+    assert fake_lcs.total() == lcs_before
+
+
+@pytest.mark.parametrize("path, body, code, message", [
+    ("/team-recommendations", {"limit": 0}, 401, "Invalid limit"),
+    ("/individual-recommendations", {"limit": "x"}, 403, "Invalid limit"),
+    ("/individual-recommendations", {"after": "not a cursor!"}, 403, "Invalid cursor"),
+    ("/open-teams", {"limit": True}, 401, "Invalid limit"),
+    ("/open-teams", {"stream": "yes"}, 401, "Invalid stream"),
+])
+def test_invalid_paging_makes_no_round_trips(client, mongo, fake_lcs, path, body, code, message):
+    lcs_before = fake_lcs.total()
+    resp = client.get(path, json=dict({"user_email": email(0), "token": "any"}, **body))
+    assert (resp.status_code, resp.get_json()["body"]) == (code, message)
+    assert mongo.count == 0
+    assert fake_lcs.total() == lcs_before
+
+
+def test_stale_team_pointer(client, mongo, fake_lcs, dataset):
+    from app.db import coll
+
+    coll("users").update_one({"_id": email(0)}, {"$set": {"team_id": "gone"}})
+    resp = client.get("/individual-recommendations", json={"user_email": email(0), "token": USER_TOKEN})
+    assert resp.status_code == 400 and resp.get_json()["body"] == "User not in a team"
+    coll("users").insert_one({"_id": "lost@example.com", "hasateam": True, "team_id": None})
+    resp = client.post("/leave-team", json={"user_email": "lost@example.com", "token": USER_TOKEN})
+    assert resp.status_code == 400
+    assert coll("users").find_one({"_id": "lost@example.com"})["hasateam"] is False
+
+
+def test_complete_team_has_no_recommendations(client, mongo, fake_lcs, dataset):
+    # team0 is complete, so it has no stored row
+    resp = client.get("/individual-recommendations", json={"user_email": email(0), "token": USER_TOKEN})
+    assert resp.status_code == 402 and resp.get_json()["body"] == "No recommendations found"
+
+
+def test_expired_cursor(client, mongo, fake_lcs, dataset):
+    from app.util import encode_cursor
+
+    def get(path, user_email, **body):
+        resp = client.get(path, json=dict(body, user_email=user_email, token=USER_TOKEN))
+        return resp.status_code, resp.get_json()["body"]
+
+    caller = free_user(dataset, 0)
+    first = client.get("/team-recommendations", json={"user_email": caller, "token": USER_TOKEN, "limit": 1})
+    assert get("/team-recommendations", caller, after=first.get_json()["next"])[0] == 200
+    gone = encode_cursor("no such id")
+    assert get("/team-recommendations", caller, after=gone) == (401, "Invalid or expired cursor")
+    member = open_team_members(dataset)[0]
+    assert get("/individual-recommendations", member, after=gone) == (403, "Invalid or expired cursor")
+
+
+def test_open_teams_etag(client, mongo, dataset):
+    body = {"user_email": email(0), "token": USER_TOKEN, "limit": 5}
+    first = client.get("/open-teams", json=body)
+    assert first.status_code == 200 and first.headers["ETag"]
+    mongo.count = 0
+    again = client.get("/open-teams", json=body, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.get_data() == b""
+    assert mongo.count == 1
+    # another page is a different response
+    other = client.get("/open-teams", json=dict(body, limit=6), headers={"If-None-Match": first.headers["ETag"]})
+    assert other.status_code == 200
+    # any team write invalidates it
+    client.post("/team-complete", json={"user_email": email(2), "token": USER_TOKEN})
+    changed = client.get("/open-teams", json=body, headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200 and changed.headers["ETag"] != first.headers["ETag"]
+
+
+def test_team_profile_etag(client, fake_lcs, dataset):
+    body = {"user_email": email(2), "token": USER_TOKEN}
+    first = client.get("/team-profile", json=body)
+    assert first.status_code == 200
+    lcs_before = fake_lcs.total()
+    again = client.get("/team-profile", json=body, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert fake_lcs.total() == lcs_before
+    client.post("/team-complete", json=body)
+    changed = client.get("/team-profile", json=body, headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200 and changed.get_json()["body"]["complete"] is True
+
+
+def test_team_profile_without_names_has_no_etag(client, fake_lcs, dataset):
+    from app.db import coll
+
+    body = {"user_email": email(2), "token": USER_TOKEN}
+    # names captured while LCS had no account for the member
+    coll("users").update_one({"_id": email(3)}, {"$unset": {"first_name": 1, "last_name": 1}})
+    resp = client.get("/team-profile", json=body)
+    assert resp.status_code == 200 and resp.get_json()["body"]["names"][1] == ""
+    assert "ETag" not in resp.headers
+    coll("users").update_one({"_id": email(3)}, {"$set": {"first_name": "hacker3", "last_name": "Hacker"}})
+    resp = client.get("/team-profile", json=body)
+    assert resp.get_json()["body"]["names"][1] == "hacker3 Hacker" and resp.headers["ETag"]
+
+
+def test_batch(client, mongo, fake_lcs, dataset):
+    body = {"user_email": email(0), "token": USER_TOKEN, "operations": [
+        {"op": "user-profile"},
+        {"op": "team-profile"},
+        {"op": "open-teams", "limit": 3},
+        {"op": "individual-recommendations", "limit": "x"},
+        {"op": "nope"},
+    ]}
+    calls_before = dict(fake_lcs.calls)
+    resp = client.get("/batch", json=body)
+    calls = {path: n - calls_before.get(path, 0) for path, n in fake_lcs.calls.items()}
+    assert resp.status_code == 200
+    results = resp.get_json()["body"]
+    assert [(r["op"], r["statusCode"]) for r in results] == [
+        ("user-profile", 200), ("team-profile", 200), ("open-teams", 200),
+        ("individual-recommendations", 403), ("nope", 400),
+    ]
+    assert results[0]["body"]["_id"] == email(0)
+    assert len(results[2]["body"]) == 3 and results[2]["next"]
+    # one validation, and a name lookup for each profile at most
+    assert calls.get("/validate", 0) <= 1, calls
+    assert calls.get("/read", 0) <= 2, calls
+    assert client.get("/batch", json=dict(body, operations=[])).status_code == 400
+
+
+def test_batch_reads_each_document_once(client, mongo, fake_lcs, dataset):
+    body = {"user_email": email(0), "token": USER_TOKEN, "operations": [
+        {"op": "user-profile"}, {"op": "team-profile"}, {"op": "team-profile"},
+    ]}
+    before = mongo.count
+    resp = client.get("/batch", json=body)
+    assert [r["statusCode"] for r in resp.get_json()["body"]] == [200, 200, 200]
+    # the caller's user document, their team, and the members' names
+    assert mongo.count - before <= 3
+
+
+def test_placements(client, mongo, fake_lcs, dataset):
+    from app.db import coll
+    from app.matchmaking import assign, load_pool
+
+    placements, _ = assign(*load_pool())
+    coll("placements").insert_many([
+        {"_id": hacker, "team_id": team_id, "score": score, "covers": covers, "run": 1}
+        for hacker, (team_id, score, covers) in placements.items()
+    ])
+    hacker, (team_id, _, _) = min(placements.items())
+    member = coll("teams").find_one({"_id": team_id})["members"][0]
+    before = mongo.count
+    resp = client.get("/placements", json={"user_email": hacker, "token": USER_TOKEN})
+    assert mongo.count - before <= 2
+    assert resp.status_code == 200 and resp.get_json()["body"]["team_id"] == team_id
+    resp = client.get("/placements", json={"user_email": member, "token": USER_TOKEN})
+    suggested = resp.get_json()["body"]
+    assert resp.status_code == 200 and hacker in [h["_id"] for h in suggested]
+    assert len(suggested) <= 2 and "run" not in suggested[0]
+
+
+def test_stored_names(client, mongo, fake_lcs, dataset):
+    import app.lcs as lcs
+    from app.db import coll
+
+    def reads(email):
+        lcs.name_cache.clear()
+        before = fake_lcs.calls.get("/read", 0)
+        resp = client.get("/user-profile", json={"user_email": email, "token": USER_TOKEN})
+        return fake_lcs.calls.get("/read", 0) - before, resp.get_json()["body"]
+
+    client.post("/user-profile", json={"user_email": "new@example.com", "token": USER_TOKEN, "skills": "go"})
+    assert coll("users").find_one({"_id": "new@example.com"})["first_name"] == "new"
+    count, profile = reads("new@example.com")
+    assert count == 0
+    assert profile["name"] == "new Hacker"
+    count, profile = reads(email(1))
+    assert count == 0 and profile["name"] == "hacker1 Hacker"
+    assert not {"first_name", "last_name", "names_at"} & set(profile)
+    # documents written before names were stored fall back to LCS
+    coll("users").update_one({"_id": email(1)}, {"$unset": {"first_name": 1, "last_name": 1, "names_at": 1}})
+    count, fallback = reads(email(1))
+    assert count == 1 and fallback["name"] == profile["name"]
+
+
+def test_joining_stores_missing_names(client, mongo, fake_lcs, dataset):
+    from app.db import coll
+
+    def post(path, **body):
+        before = fake_lcs.calls.get("/read", 0)
+        resp = client.post(path, json=dict(body, token=USER_TOKEN))
+        return resp.status_code, fake_lcs.calls.get("/read", 0) - before
+
+    captain, hacker = free_user(dataset, 0), free_user(dataset, 1)
+    coll("users").update_many({"_id": {"$in": [captain, hacker]}},
+                              {"$unset": {"first_name": 1, "last_name": 1, "names_at": 1}})
+    assert post("/start-a-team", user_email=captain, name="named", desc="d", skills="go") == (200, 1)
+    assert coll("users").find_one({"_id": captain})["first_name"] == captain.split("@")[0]
+    assert post("/confirm-member", user_email=captain, email=hacker) == (200, 1)
+    assert "names_at" in coll("users").find_one({"_id": hacker})
+    # names already stored, or a claim that fails, don't go to LCS
+    assert post("/start-a-team", user_email=free_user(dataset, 2), name="other", desc="d", skills="go") == (200, 0)
+    assert post("/confirm-member", user_email=free_user(dataset, 2), email=hacker)[1] == 0
+
+
+def test_confirm_member_claims(client, mongo, fake_lcs, dataset):
+    from app.db import coll
+
+    def post(path, **body):
+        resp = client.post(path, json=dict(body, token=USER_TOKEN))
+        return resp.status_code, resp.get_json()["body"]
+
+    captain = open_team_members(dataset)[0]
+    team_id = coll("users").find_one({"_id": captain})["team_id"]
+    # a hacker without a profile gets a bare one, as with add-team-member
+    assert post("/confirm-member", user_email=captain, email="new@example.com") == (200, "Success")
+    hacker = coll("users").find_one({"_id": "new@example.com"})
+    assert hacker["team_id"] == team_id and hacker["skills"] == [] and "names_at" in hacker
+    assert post("/confirm-member", user_email=captain, email=email(0)) == (405, "Hacker in a team")
+    assert email(0) not in coll("teams").find_one({"_id": team_id})["members"]
+
+
+def test_rejected_interest_changes_no_versions(client, mongo, fake_lcs, dataset):
+    from app.db import coll
+
+    def versions():
+        return coll("meta").find_one({"_id": "open_teams"}), coll("teams").find_one({"_id": "team1"})["version"]
+
+    def post(user_email, name):
+        return client.post("/interested", json={"user_email": user_email, "token": USER_TOKEN, "name": name})
+
+    hacker = free_user(dataset, 0)
+    assert post(hacker, "team1").status_code == 200
+    before = versions()
+    assert post(email(0), "team1").status_code == 403
+    # team0 is complete
+    assert post(hacker, "team0").status_code == 405
+    assert post(hacker, "no such team").status_code == 402
+    assert versions() == before
+    assert coll("users").find_one({"_id": hacker})["potentialteams"] == ["team1"]
+
+
+@pytest.mark.skipif(not os.environ.get("BENCH_MONGO_URI"), reason="mongomock's find_one_and_update isn't atomic")
+def test_concurrent_confirms_fill_one_slot(client, mongo, fake_lcs, dataset):
+    from app.db import coll
+
+    captain = open_team_members(dataset)[0]
+    team_id = coll("users").find_one({"_id": captain})["team_id"]
+    coll("teams").update_one({"_id": team_id}, {"$push": {"members": "third@example.com"}})
+    hackers = [free_user(dataset, i) for i in range(8)]
+
+    def confirm(hacker):
+        body = {"user_email": captain, "token": USER_TOKEN, "email": hacker}
+        return client.application.test_client().post("/confirm-member", json=body).status_code
+
+    with ThreadPoolExecutor(len(hackers)) as pool:
+        codes = list(pool.map(confirm, hackers))
+    assert sorted(codes) == [200] + [402] * (len(hackers) - 1)
+    assert len(coll("teams").find_one({"_id": team_id})["members"]) == 4
+    assert coll("users").count_documents({"_id": {"$in": hackers}, "team_id": team_id}) == 1
+
+
+def test_lcs_outage(client, mongo, fake_lcs, dataset, monkeypatch):
+    import app.config as config
+    import app.schemas as schemas
+    from app.breaker import OPEN, lcs_breaker
+
+    def get_profile(i):
+        return client.get("/user-profile", json={"user_email": email(i), "token": USER_TOKEN})
+
+    lcs_breaker._reset()
+    assert get_profile(0).status_code == 200
+    monkeypatch.setattr(config, "LCS_RETRIES", 0, raising=False)
+    monkeypatch.setattr(config, "LCS_BREAKER_MIN_CALLS", 2, raising=False)
+    schemas.validation_cache.clear()
+    schemas.recent_sessions.pop((email(1), USER_TOKEN))
+    fake_lcs.status = 503
+    try:
+        # a session validated before the outage is still let in, names and all
+        resp = get_profile(0)
+        assert resp.status_code == 200 and resp.get_json()["body"]["name"] == "hacker0 Hacker"
+        assert get_profile(1).status_code == 404
+        assert lcs_breaker.state == OPEN
+        before = fake_lcs.calls["/validate"]
+        assert get_profile(0).status_code == 200 and get_profile(1).status_code == 404
+        assert fake_lcs.calls["/validate"] == before
+    finally:
+        fake_lcs.status = 200
+        lcs_breaker._reset()
+
+
+def test_lcs_rejection_is_not_an_outage(client, mongo, fake_lcs, dataset, monkeypatch):
+    import app.schemas as schemas
+
+    body = {"user_email": email(0), "token": USER_TOKEN}
+    assert client.get("/user-profile", json=body).status_code == 200
+    schemas.validation_cache.clear()
+    monkeypatch.setattr(fake_lcs, "handle", lambda path, body: {"statusCode": 401, "body": "Unauthorized"})
+    # LCS answered, so the recently accepted session doesn't count
+    assert client.get("/user-profile", json=body).status_code == 404
+    assert schemas.recent_sessions.get((email(0), USER_TOKEN)) is None
+
+
+@pytest.mark.parametrize("mode", ["sync"], indirect=True)
+def test_async_responses_match(client, mongo, fake_lcs, dataset, monkeypatch):
+    import app.aio as aio
+    import app.config as config
+    from conftest import AsyncCollection
+    from app.db import coll
+
+    requests = [
+        ("/user-profile", {"user_email": email(0)}),
+        ("/user-profile", {"user_email": "nobody@example.com"}),
+        ("/team-profile", {"user_email": email(2)}),
+        ("/team-profile", {"user_email": free_user(dataset, 0)}),
+        ("/open-teams", {"user_email": email(0), "limit": 3}),
+        ("/team-recommendations", {"user_email": free_user(dataset, 0), "limit": 5}),
+        ("/individual-recommendations", {"user_email": open_team_members(dataset)[0]}),
+        ("/individual-recommendations", {"user_email": email(0), "limit": "x"}),
+    ]
+
+    def responses():
+        return [
+            (resp.status_code, resp.get_json())
+            for resp in (client.get(path, json=dict(body, token=USER_TOKEN)) for path, body in requests)
+        ]
+
+    expected = responses()
+    monkeypatch.setattr(config, "ASYNC_MODE", True)
+    if not os.environ.get("BENCH_MONGO_URI"):
+        monkeypatch.setattr(aio, "acoll", lambda coll_name: AsyncCollection(coll(coll_name)))
+    assert responses() == expected
+
+
+def test_team_writes_refresh_rows(client, fake_lcs, dataset, refresh_worker):
+    from app.db import coll
+
+    def row(row_id):
+        doc = coll("recommendations").find_one({"_id": row_id})
+        return doc and [m["_id"] for m in doc["matches"]]
+
+    founder = free_user(dataset, 0)
+    assert row("user:" + founder) is not None
+    pythonista = next(
+        user["_id"] for user in coll("users").find({"hasateam": False, "skills": "python"})
+        if user["_id"] != founder and row("user:" + user["_id"]) is not None
+    )
+    body = {"user_email": founder, "token": USER_TOKEN}
+    resp = client.post("/start-a-team", json=dict(body, name="fresh team", desc="d", skills="python"))
+    assert resp.status_code == 200
+    refresh_worker.drain()
+    # the founder has a team now; the new team gets ranked hackers and is
+    # ranked for them
+    assert row("user:" + founder) is None
+    hackers = row("team:fresh team")
+    assert hackers and founder not in hackers
+    assert all("python" in coll("users").find_one({"_id": h})["skills"] for h in hackers)
+    assert "fresh team" in row("user:" + pythonista)
+    assert client.post("/team-complete", json=body).status_code == 200
+    refresh_worker.drain()
+    assert row("team:fresh team") is None
+    assert "fresh team" not in row("user:" + pythonista)
+
+
+@pytest.mark.skipif(not os.environ.get("BENCH_MONGO_URI"), reason="mongomock has no $setIntersection")
+def test_profile_writes_refresh_rows(client, fake_lcs, dataset, refresh_worker):
+    from app.db import coll
+
+    hacker = free_user(dataset, 0)
+    coll("recommendations").delete_one({"_id": "user:" + hacker})
+    resp = client.post("/user-profile", json={"user_email": hacker, "token": USER_TOKEN, "skills": "rare-skill"})
+    assert resp.status_code == 200
+    refresh_worker.drain()
+    # no open team wants the skill, so the user's row is empty and no team row lists them
+    assert coll("recommendations").find_one({"_id": "user:" + hacker})["matches"] == []
+    assert coll("recommendations").count_documents({"_id": {"$regex": "^team:"}, "matches._id": hacker}) == 0
@@ -0,0 +1,46 @@
+import time
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import app.config as config
+from seed_data import PRIZES, SKILLS, email
+
+TEAMS = 1000
+
+
+def team_docs(count):
+    return [{
+        "_id": "team%d" % k,
+        "members": [email(2 * k), email(2 * k + 1)],
+        "names": ["Hacker %d" % (2 * k), "Hacker %d" % (2 * k + 1)],
+        "desc": "we build %s things" % SKILLS[k % len(SKILLS)],
+        "partnerskills": [SKILLS[k % len(SKILLS)], SKILLS[(k + 3) % len(SKILLS)]],
+        "prizes": [PRIZES[k % len(PRIZES)]],
+        "complete": False,
+        "interested": [email(k + 7)],
+        "owner": ObjectId(),
+        "updated_at": datetime(2020, 2, 1, 12, 30),
+    } for k in range(count)]
+
+
+def test_return_resp_encoders(record, monkeypatch):
+    """return_resp on a 1k-team payload: orjson and the json fallback must
+    produce the same bytes. Their timings go to the report; which is faster
+    isn't asserted, since wall-clock comparisons flake on shared runners."""
+    from app import app
+    from app.util import return_resp
+
+    teams = team_docs(TEAMS)
+    bodies = {}
+    with app.app_context():
+        for encoder in ("json", "orjson"):
+            monkeypatch.setattr(config, "JSON_ENCODER", encoder, raising=False)
+            latencies = []
+            for _ in range(20):
+                start = time.perf_counter()
+                bodies[encoder] = return_resp(200, teams).get_data()
+                latencies.append(time.perf_counter() - start)
+            record("return_resp 1k teams (%s)" % encoder, TEAMS, latencies)
+    assert bodies["orjson"] == bodies["json"]
@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+from conftest import DIRECTOR_TOKEN
+
+import app.lcs as lcs
+
+
+@pytest.fixture
+def director(fake_lcs, monkeypatch):
+    """Sets the cached director token; the fixture puts the old one back."""
+    monkeypatch.setattr(lcs, "_director_token", None)
+    monkeypatch.setattr(lcs, "_director_token_expires", 0.0)
+    monkeypatch.setattr(lcs, "_director_refreshing", False)
+
+    def set_token(token, expires_in):
+        lcs._director_token = token
+        lcs._director_token_expires = time.time() + expires_in
+
+    return set_token
+
+
+def calls(fake_lcs):
+    return fake_lcs.calls["/authorize"], fake_lcs.calls["/read"]
+
+
+def wait_for_refresh():
+    deadline = time.time() + 5
+    while lcs._director_refreshing and time.time() < deadline:
+        time.sleep(0.01)
+    assert not lcs._director_refreshing
+
+
+def test_rejected_token_is_replaced_and_read_retried_once(fake_lcs, director):
+    director("revoked", 3600)
+    authorize, read = calls(fake_lcs)
+    resp = lcs.read(lcs.call_auth_endpoint(), {"email": "a@x.com"})
+    assert resp["statusCode"] == 200 and resp["body"][0]["first_name"] == "a"
+    assert calls(fake_lcs) == (authorize + 1, read + 2)
+    assert lcs._director_token == DIRECTOR_TOKEN
+
+
+def test_token_inside_the_margin_is_refreshed_in_the_background(fake_lcs, director, monkeypatch):
+    monkeypatch.setattr(fake_lcs, "latency", 0.5)
+    director("expiring", 10)
+    authorize, _ = calls(fake_lcs)
+    start = time.perf_counter()
+    # callers keep the current token instead of waiting, and only one
+    # refresh goes out
+    threads = [threading.Thread(target=lcs.call_auth_endpoint) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert lcs.call_auth_endpoint() == "expiring"
+    assert time.perf_counter() - start < 0.5
+    wait_for_refresh()
+    assert fake_lcs.calls["/authorize"] == authorize + 1
+    assert lcs.call_auth_endpoint() == DIRECTOR_TOKEN
+
+
+def test_expired_token_is_fetched_before_use(fake_lcs, director):
+    director("expired", -1)
+    authorize, _ = calls(fake_lcs)
+    assert lcs.call_auth_endpoint() == DIRECTOR_TOKEN
+    assert fake_lcs.calls["/authorize"] == authorize + 1
@@ -0,0 +1,26 @@
+import random
+import time
+
+from app.similarity import SkillIndex
+from seed_data import PRIZES, SKILLS, email
+
+HACKERS = 20000
+
+
+def test_top_hackers_20k(record):
+    """Ranking 20k unteamed hackers for a team (about 1 ms a query; the
+    timings go to the report rather than an assertion that would flake on a
+    loaded machine)."""
+    rng = random.Random(1)
+    skills = SKILLS + ["skill%d" % i for i in range(40)]
+    index = SkillIndex({
+        "_id": email(i), "skills": rng.sample(SKILLS, 3) + rng.sample(skills, 1),
+        "prizes": rng.sample(PRIZES, 2), "hasateam": False,
+    } for i in range(HACKERS))
+    latencies = []
+    for i in range(50):
+        start = time.perf_counter()
+        matches = index.top(rng.sample(SKILLS, 2 + i % 4), rng.sample(PRIZES, 1), 100)
+        latencies.append(time.perf_counter() - start)
+        assert len(matches) == 100
+    record("similarity top-100", HACKERS, latencies)
@@ -0,0 +1,67 @@
+import app.config as config
+import app.schemas as schemas
+from app.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def breaker(monkeypatch, **settings):
+    settings = dict({"LCS_BREAKER_MIN_CALLS": 4, "LCS_BREAKER_OPEN_SECONDS": 10, "LCS_BREAKER_PROBES": 1}, **settings)
+    for name, value in settings.items():
+        monkeypatch.setattr(config, name, value, raising=False)
+    clock = Clock()
+    return CircuitBreaker("test", clock), clock
+
+
+def test_opens_on_failures_and_recovers_through_a_probe(monkeypatch):
+    b, clock = breaker(monkeypatch)
+    for ok in (True, False, True, False):
+        assert b.allow()
+        b.record(ok, 0.01)
+    assert b.state == OPEN and not b.allow()
+    clock.now = 10
+    assert b.allow() and b.state == HALF_OPEN
+    assert not b.allow()
+    b.record(False, 0.01)
+    assert b.state == OPEN and not b.allow()
+    clock.now = 20
+    assert b.allow()
+    b.record(True, 0.01)
+    assert b.state == CLOSED and b.allow()
+
+
+def test_opens_on_slow_calls(monkeypatch):
+    b, _ = breaker(monkeypatch, LCS_BREAKER_SLOW_CALL=1.0, LCS_BREAKER_SLOW_RATE=0.75)
+    for seconds in (2, 2, 0.1):
+        b.allow()
+        b.record(True, seconds)
+    assert b.state == CLOSED
+    b.allow()
+    b.record(True, 2)
+    assert b.state == OPEN
+
+
+def test_lost_probe_is_retried(monkeypatch):
+    b, clock = breaker(monkeypatch)
+    for _ in range(4):
+        b.allow()
+        b.record(False, 0.01)
+    clock.now = 10
+    assert b.allow() and not b.allow()
+    clock.now = 20
+    assert b.allow()
+
+
+def test_recent_sessions_survive_an_outage():
+    schemas.recent_sessions.clear()
+    assert schemas.session_result(("a", "t"), 200) == 200
+    assert schemas.session_result(("a", "t"), None) == 200
+    assert schemas.session_result(("b", "t"), None) is None
+    rejected = {"statusCode": 403, "body": "Permission denied"}
+    assert schemas.session_result(("a", "t"), rejected) == rejected
+    assert schemas.session_result(("a", "t"), None) is None
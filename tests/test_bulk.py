@@ -0,0 +1,112 @@
+import io
+import json
+
+import pytest
+
+import app.db as db
+from app import app
+from app.bulk import USER_FIELDS, import_teams, import_users, read_records, write_records
+from app.recommendations import drain
+
+
+@pytest.fixture
+def users_and_teams(mongo_client):
+    yield db.coll("users"), db.coll("teams")
+    drain()
+
+
+def _teams(*records):
+    return [json.dumps(record) for record in records]
+
+
+def test_records_are_normalized_like_the_api(users_and_teams):
+    users, teams = users_and_teams
+    records = read_records(io.StringIO('email,skills,prizes\n A@X.com ,"Python, GO",\n,python,\n'), "csv")
+    assert import_users(records)["skipped"] == 1
+    assert users.find_one({"_id": "a@x.com"}) == {
+        "_id": "a@x.com", "skills": ["python", "go"], "prizes": [], "hasateam": False, "team_id": None,
+        "potentialteams": [],
+    }
+
+    records = [
+        {"name": " Team A", "skills": ["React "], "members": "a@x.com, B@x.com", "complete": "true"},
+        {"name": "t", "members": "a,b,c,d,e"},
+    ]
+    assert import_teams(records)["skipped"] == 1
+    team = teams.find_one({"_id": "team a"})
+    assert team["partnerskills"] == ["react"] and team["complete"] is True
+    assert team["members"] == ["a@x.com", "b@x.com"]
+    assert users.find_one({"_id": "b@x.com"}, {"_id": 0, "hasateam": 1, "team_id": 1}) == {
+        "hasateam": True, "team_id": "team a",
+    }
+
+
+def test_members_move_between_teams(users_and_teams):
+    users, teams = users_and_teams
+    import_teams(read_records(_teams(
+        {"name": "a", "members": ["a1@x.com", "b1@x.com"]},
+        {"name": "b", "members": ["b2@x.com"]},
+        {"name": "c", "members": ["c1@x.com"]},
+    ), "jsonl"))
+    version = teams.find_one({"_id": "a"})["version"]
+
+    # b1 moves to b, c1 leaves c empty, b2 is listed twice
+    stats = import_teams(read_records(_teams(
+        {"name": "b", "members": ["b1@x.com", "b2@x.com", "c1@x.com"]},
+        {"name": "d", "members": ["b2@x.com"]},
+    ), "jsonl"))
+    assert stats["skipped"] == 1
+    team_a = teams.find_one({"_id": "a"})
+    assert team_a["members"] == ["a1@x.com"] and team_a["version"] > version
+    assert teams.find_one({"_id": "c"}) is None
+    assert teams.find_one({"_id": "d"}) is None
+    assert users.find_one({"_id": "b1@x.com"})["team_id"] == "b"
+
+    # re-importing a team without a member frees them
+    import_teams(read_records(_teams({"name": "b", "members": ["b2@x.com"]}), "jsonl"))
+    for email in ("b1@x.com", "c1@x.com"):
+        assert users.find_one({"_id": email}, {"_id": 0, "hasateam": 1, "team_id": 1}) == {
+            "hasateam": False, "team_id": None,
+        }
+    assert users.find_one({"_id": "b2@x.com"})["team_id"] == "b"
+
+
+def test_import_refreshes_recommendation_rows(users_and_teams):
+    users, teams = users_and_teams
+    users.insert_one({"_id": "h@x.com", "skills": ["python"], "prizes": [], "hasateam": False, "team_id": None})
+    rows = db.coll("recommendations")
+    rows.insert_many([
+        {"_id": "team:a", "matches": [{"_id": "gone@x.com"}], "updated_at": 0},
+        {"_id": "user:a1@x.com", "matches": [{"_id": "b"}], "updated_at": 0},
+    ])
+
+    import_teams([{"name": "a", "skills": "python", "members": "a1@x.com"}])
+    drain()
+    [match] = rows.find_one({"_id": "team:a"})["matches"]
+    assert match["_id"] == "h@x.com" and match["hasateam"] is False and match["score"] > 0
+    # a1 has a team now, so no open-team recommendations
+    assert rows.find_one({"_id": "user:a1@x.com"}) is None
+
+
+def test_import_and_export_round_trip(tmp_path, users_and_teams):
+    users, _ = users_and_teams
+    cli = app.test_cli_runner()
+
+    users_file = tmp_path / "users.csv"
+    users_file.write_text("email,skills,prizes\na@x.com,python,best hack\n,python,\nb@x.com,,\n")
+    result = cli.invoke(args=["import-users", str(users_file)])
+    assert "2 inserted, 0 updated, 1 skipped" in result.output
+    teams_file = tmp_path / "teams.jsonl"
+    teams_file.write_text(json.dumps({"name": "team a", "members": ["a@x.com", "c@x.com"]}) + "\n")
+    assert "1 inserted" in cli.invoke(args=["import-teams", str(teams_file)]).output
+    assert users.find_one({"_id": "c@x.com"})["team_id"] == "team a"
+    result = cli.invoke(args=["export", "teams", "--format", "jsonl"])
+    assert json.loads(result.stdout.splitlines()[0])["members"] == ["a@x.com", "c@x.com"]
+
+    users.delete_many({})
+    with app.app_context():
+        f = io.StringIO()
+        write_records([{"email": "a@x.com", "skills": ["python", "go"], "prizes": [], "team_id": None}], f, "csv", USER_FIELDS)
+    f.seek(0)
+    import_users(read_records(f, "csv"))
+    assert users.find_one({"_id": "a@x.com"})["skills"] == ["python", "go"]
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+from app.cache import TTLCache
+
+
+def test_entries_expire():
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_uncached_result():
+    cache = TTLCache(ttl=60)
+    calls = []
+    loader = lambda: calls.append(1) or 500
+    cache.get_or_load("k", loader, lambda value: None)
+    cache.get_or_load("k", loader, lambda value: None)
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(1)
+        return 200
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == [200] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_loader_error_is_shared_and_not_cached():
+    cache = TTLCache(ttl=60)
+
+    def loader():
+        raise ValueError("lcs down")
+
+    with pytest.raises(ValueError):
+        cache.get_or_load("k", loader)
+    assert cache.get_or_load("k", lambda: 200) == 200
+
+
+if __name__ == '__main__':
+    pytest.main()
+
+
+def test_named_caches_export_lookups():
+    from prometheus_client import REGISTRY
+
+    def lookups(outcome):
+        return REGISTRY.get_sample_value("teamru_cache_lookups_total", {"cache": "test", "outcome": outcome}) or 0
+
+    before = {outcome: lookups(outcome) for outcome in ("hit", "miss")}
+    cache = TTLCache(maxsize=10, ttl=60, name="test")
+    cache.get("a")
+    cache.get_or_load("a", lambda: 1)
+    cache.get("a")
+    cache.get_or_load("a", lambda: 2)
+    assert lookups("hit") - before["hit"] == 2
+    assert lookups("miss") - before["miss"] == 2
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from bson import Decimal128, ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.json_provider import JSONProvider
+
+app = Flask(__name__)
+fast = JSONProvider(app)
+default = DefaultJSONProvider(app)
+
+
+def test_same_bytes_as_flask():
+    body = {"statusCode": 200, "body": [{"_id": "t", "members": ["a@b.c"], "score": 1.5,
+                                         "complete": False, "desc": None, "at": datetime(2020, 1, 2)}]}
+    with app.app_context():
+        assert fast.response(body).get_data() == default.response(body).get_data()
+
+
+def test_non_ascii_big_ints_and_odd_floats_fall_back():
+    bodies = (
+        {"desc": "café \U0001f680"}, {"n": 2 ** 70}, {1: "int key"},
+        {"x": float("nan")}, {"x": [float("-inf")]}, {"x": 1e16}, {"x": 1e-05}, {"x": 1.5e-07, "y": None},
+    )
+    for body in bodies:
+        assert fast.dumps(body, separators=(",", ":")) == default.dumps(body, separators=(",", ":"))
+
+
+def test_bson_types():
+    oid = ObjectId()
+    assert fast.dumps({"id": oid, "d": Decimal128("1.50")}, separators=(",", ":")) == (
+        '{"d":"1.50","id":"%s"}' % oid
+    )
+    # the json fallback (any other formatting options) handles them too
+    assert fast.dumps({"id": oid}, indent=None) == '{"id": "%s"}' % oid
+
+
+def test_flask_types_and_arguments():
+    import dataclasses
+    import uuid
+    from decimal import Decimal
+
+    @dataclasses.dataclass
+    class Point:
+        y: float
+        x: float
+
+    body = {"d": Decimal("1.5"), "u": uuid.UUID(int=1), "on": datetime(2020, 1, 2).date(),
+            "p": Point(float("inf"), 1.0), "q": Point(2.5, 1.0)}
+    with app.app_context():
+        assert fast.response(body).get_data() == default.response(body).get_data()
+        assert fast.response(1, 2).get_data() == default.response(1, 2).get_data()
+        assert fast.response(a=1).get_data() == default.response(a=1).get_data()
+        assert fast.response().get_data() == default.response().get_data()
@@ -0,0 +1,33 @@
+from collections import Counter
+
+from app.matchmaking import assign
+
+
+def user(email, skills, prizes=()):
+    return {"_id": email, "skills": list(skills), "prizes": list(prizes), "hasateam": False}
+
+
+def team(name, skills, prizes=(), members=1):
+    return {"_id": name, "partnerskills": list(skills), "prizes": list(prizes), "members": ["m"] * members}
+
+
+def test_fills_teams_up_to_four_members():
+    users = [user("h%d" % i, ["python"]) for i in range(6)]
+    placements, _ = assign(users, [team("a", ["python"], members=3), team("b", ["python"], members=4)])
+    assert Counter(team_id for team_id, _, _ in placements.values()) == {"a": 1}
+
+
+def test_scarce_skills_go_where_they_are_wanted():
+    users = [user("rustacean", ["rust", "python"]), user("p1", ["python"]), user("p2", ["python"])]
+    teams = [team("a", ["python"]), team("b", ["rust", "python"], members=3)]
+    placements, total = assign(users, teams)
+    assert placements["rustacean"][0] == "b"
+    assert placements["rustacean"][2] == ["s:python", "s:rust"]
+    # b's python is covered, so only a wants another python hacker
+    assert {email: placement[0] for email, placement in placements.items()} == {"rustacean": "b", "p1": "a"}
+    assert sum(gain for _, gain, _ in placements.values()) == total
+
+
+def test_no_placement_without_gain():
+    placements, total = assign([user("h", ["go"])], [team("a", ["python"]), team("b", [])])
+    assert placements == {} and total == 0
@@ -0,0 +1,32 @@
+import app.db as db
+from app import app
+from app.migrations import backfill_team_ids
+
+
+def test_backfill_team_ids(mongo_client):
+    users, teams = db.coll("users"), db.coll("teams")
+    teams.insert_many([
+        {"_id": "a", "members": ["a1@x.com", "a2@x.com"]},
+        {"_id": "b", "members": ["b1@x.com"]},
+    ])
+    users.insert_many([
+        # members written before team_id existed, one with a wrong flag
+        {"_id": "a1@x.com", "hasateam": True},
+        {"_id": "a2@x.com", "hasateam": False},
+        {"_id": "b1@x.com", "hasateam": True},
+        # no team, and a stale flag left by a team that is gone
+        {"_id": "free@x.com", "hasateam": False},
+        {"_id": "stale@x.com", "hasateam": True},
+    ])
+
+    assert backfill_team_ids(batch_size=1) == 5
+    assert {u["_id"]: (u["hasateam"], u["team_id"]) for u in users.find()} == {
+        "a1@x.com": (True, "a"),
+        "a2@x.com": (True, "a"),
+        "b1@x.com": (True, "b"),
+        "free@x.com": (False, None),
+        "stale@x.com": (False, None),
+    }
+    # running it again changes nothing
+    result = app.test_cli_runner().invoke(args=["migrate-team-ids"])
+    assert "updated 0 users" in result.output
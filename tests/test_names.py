@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+import app.db as db
+from app import app
+from app.names import refresh_names
+
+
+class FakeLcs:
+    """Stands in for lcs.read_name_fields and records the emails asked for."""
+
+    def __init__(self):
+        self.reads = []
+        self.reachable = True
+
+    def read_name_fields(self, emails):
+        self.reads.append(list(emails))
+        if not self.reachable:
+            return None
+        return {email: {"first_name": email.split("@")[0], "last_name": "Hacker"} for email in emails}
+
+
+@pytest.fixture
+def lcs(mongo_client, monkeypatch):
+    fake = FakeLcs()
+    monkeypatch.setattr("app.names.read_name_fields", fake.read_name_fields)
+    return fake
+
+
+def test_refresh_in_batches(lcs):
+    db.coll("users").insert_many([{"_id": "u%d@x.com" % i} for i in range(5)])
+    assert refresh_names(batch_size=2) == 5
+    assert [len(emails) for emails in lcs.reads] == [2, 2, 1]
+    assert db.coll("users").find_one({"_id": "u3@x.com"})["first_name"] == "u3"
+    assert refresh_names(batch_size=2) == 0
+
+
+def test_refresh_stops_when_lcs_is_unreachable(lcs):
+    db.coll("users").insert_many([{"_id": "u%d@x.com" % i} for i in range(5)])
+    lcs.reachable = False
+    assert refresh_names(batch_size=2) == 0
+    assert len(lcs.reads) == 1
+    assert db.coll("users").count_documents({"names_at": {"$exists": True}}) == 0
+
+
+def test_refresh_only_stale_names(lcs):
+    now = time.time()
+    db.coll("users").insert_many([
+        {"_id": "old@x.com", "names_at": now - 200},
+        {"_id": "new@x.com", "names_at": now - 50},
+        {"_id": "never@x.com"},
+    ])
+    assert refresh_names(max_age=100) == 2
+    assert sorted(lcs.reads[0]) == ["never@x.com", "old@x.com"]
+    assert db.coll("users").find_one({"_id": "new@x.com"})["names_at"] == now - 50
+
+
+def test_refresh_every(lcs, monkeypatch):
+    class Stop(Exception):
+        pass
+
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise Stop()
+
+    monkeypatch.setattr("app.commands.time.sleep", sleep)
+    db.coll("users").insert_one({"_id": "u@x.com"})
+    result = app.test_cli_runner().invoke(args=["refresh-names", "--every", "30"])
+    assert isinstance(result.exception, Stop)
+    assert sleeps == [30, 30]
+    assert result.output.count("refreshed") == 2 and "refreshed 1 names" in result.output
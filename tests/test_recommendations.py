@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import app.config as config
+import app.db as db
+from app.recommendations import compute_team_matches, patch_matches, team_score
+
+
+def team(name, skills, prizes=(), complete=False):
+    return {"_id": name, "partnerskills": list(skills), "prizes": list(prizes), "complete": complete}
+
+
+def row(*scored):
+    return [dict(team(name, []), score=score) for name, score in scored]
+
+
+def names(matches):
+    return [(m["_id"], m["score"]) for m in matches]
+
+
+def test_team_score():
+    user = {"skills": ["python", "go"], "prizes": ["best hack"]}
+    assert team_score(team("a", ["python", "go", "rust"], ["best hack"]), user) == 3
+    assert team_score(team("b", ["rust"]), user) == 0
+
+
+def test_patch_moves_inserts_and_drops_the_team():
+    matches = row(("a", 3), ("b", 2), ("c", 1))
+    new = team("bb", ["python"])
+    assert names(patch_matches(matches, "bb", new, 2)) == [("a", 3), ("b", 2), ("bb", 2), ("c", 1)]
+    assert names(patch_matches(matches, "c", team("c", []), 4)) == [("c", 4), ("a", 3), ("b", 2)]
+    assert names(patch_matches(matches, "b", team("b", []), 1)) == [("a", 3), ("b", 1), ("c", 1)]
+    assert names(patch_matches(matches, "a", None, 0)) == [("b", 2), ("c", 1)]
+    assert patch_matches(matches, "zz", None, 0) == matches
+
+
+def test_full_rows_are_recomputed_when_the_team_drops(monkeypatch):
+    monkeypatch.setattr(config, "RECOMMENDATIONS_ROW_SIZE", 2, raising=False)
+    matches = row(("a", 3), ("b", 2))
+    # a team outside the row may belong in the freed slot
+    assert patch_matches(matches, "a", None, 0) is None
+    assert patch_matches(matches, "b", team("b", []), 1) is None
+    assert names(patch_matches(matches, "b", team("b", []), 4)) == [("b", 4), ("a", 3)]
+    assert names(patch_matches(matches, "c", team("c", []), 1)) == [("a", 3), ("b", 2)]
+    assert names(patch_matches(matches, "c", team("c", []), 3)) == [("a", 3), ("c", 3)]
+
+
+@pytest.mark.skipif(not os.environ.get("BENCH_MONGO_URI"), reason="mongomock has no $setIntersection")
+def test_open_teams_ranking(mongo_client, monkeypatch):
+    monkeypatch.setattr(config, "RECOMMENDATIONS_ROW_SIZE", 3, raising=False)
+    teams = [
+        team("skills", ["python", "go"]),
+        team("prize", ["rust"], ["best hack"]),
+        team("both", ["python", "go"], ["best hack", "best ml"]),
+        team("one", ["python"]),
+        team("also one", ["go"]),
+        team("none", ["rust"], ["best design"]),
+        team("complete", ["python", "go"], ["best hack"], complete=True),
+    ]
+    db.coll("teams").insert_many(teams)
+    user = {"_id": "u@x.com", "skills": ["python", "go"], "prizes": ["best hack", "best ml"]}
+    matches = compute_team_matches(user)
+    # prizes count like skills; ties go by name; the row is cut at its size
+    assert names(matches) == [("both", 4), ("skills", 2), ("also one", 1)]
+    by_name = {t["_id"]: t for t in teams}
+    assert all(m["score"] == team_score(by_name[m["_id"]], user) for m in matches)
+    assert names(compute_team_matches(dict(user, skills=["rust"]))) == [("both", 2), ("prize", 2), ("none", 1)]
@@ -0,0 +1,79 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import app.similarity as similarity
+from app.similarity import SkillIndex, user_terms
+
+
+def user(email, skills, prizes=(), hasateam=False):
+    return {"_id": email, "skills": list(skills), "prizes": list(prizes), "hasateam": hasateam}
+
+
+def test_rare_terms_weigh_more_and_ties_go_by_id():
+    index = SkillIndex([
+        user("a", ["python"]),
+        user("b", ["python", "rust"]),
+        user("c", ["rust"]),
+        user("d", ["python"]),
+        user("e", ["go"], hasateam=True),
+    ])
+    ranked = index.top(["python", "rust", "go"], [], 10)
+    assert [m["_id"] for m in ranked] == ["b", "c", "a", "d"]
+    assert ranked[1]["score"] > ranked[2]["score"]
+    assert index.top(["python"], [], 1)[0]["_id"] == "a"
+
+
+def test_updates_are_incremental():
+    index = SkillIndex([user("a", ["python"]), user("b", ["go"])])
+    index.update_user(user("a", ["go"]))
+    index.update_user(user("b", ["go"], hasateam=True))
+    index.update_user(user("c", [], ["best ml"]))
+    assert [m["_id"] for m in index.top(["go", "python"], ["best ml"], 10)] == ["a", "c"]
+    index.remove_user("a")
+    assert len(index) == 1 and index.top(["go"], [], 10) == []
+    assert "c" in index and "a" not in index and set(index.terms()) == {"p:best ml"}
+
+
+def test_subset_ranking_matches_summed_scores():
+    rng = random.Random(7)
+    vocabulary = ["s%d" % i for i in range(12)]
+    index = SkillIndex(user("h%d" % i, rng.sample(vocabulary, 3), rng.sample(["p1", "p2", "p3"], 1))
+                       for i in range(2000))
+    for _ in range(50):
+        query = user_terms({"skills": rng.sample(vocabulary, rng.randint(1, 6)), "prizes": ["p2"]})
+        terms = [t for t in query if t in index.terms()]
+        weights = [index.idf(t) for t in terms]
+        k = rng.choice([1, 20, 500])
+        assert index._by_subset(terms, weights, k) == [
+            (email, round(score, 9)) for email, score in index._accumulate(terms, weights, k)
+        ]
+
+
+def test_first_build_runs_outside_the_lock(monkeypatch):
+    """Concurrent first lookups share one build, and a user change made while
+    it reads Mongo is applied to the result."""
+    reading = threading.Event()
+    release = threading.Event()
+    builds = []
+
+    def load_index():
+        builds.append(1)
+        reading.set()
+        release.wait(5)
+        return SkillIndex([user("a", ["python"]), user("b", ["python"])])
+
+    monkeypatch.setattr(similarity, "load_index", load_index)
+    similarity.reset_index()
+    try:
+        with ThreadPoolExecutor(4) as pool:
+            lookups = [pool.submit(similarity.top_hackers, {"partnerskills": ["python"]}, 10) for _ in range(4)]
+            assert reading.wait(5)
+            # the lock is free while Mongo is read
+            similarity.update_user("b", user("b", ["python"], hasateam=True))
+            release.set()
+            results = [[m["_id"] for m in lookup.result()] for lookup in lookups]
+        assert results == [["a"]] * 4
+        assert len(builds) == 1
+    finally:
+        similarity.reset_index()
@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask, copy_current_request_context
+
+import app.db as db
+import app.unit_of_work as unit_of_work
+from app.unit_of_work import _UNSUPPORTED, _project, merge_updates
+
+DOC = {"_id": "team", "members": ["a"], "complete": False, "version": 3}
+
+
+def test_projection():
+    assert _project(DOC, None) == DOC and _project(DOC, None) is not DOC
+    assert _project(DOC, {"members": 1}) == {"_id": "team", "members": ["a"]}
+    assert _project(DOC, {"complete": 1, "_id": 0}) == {"complete": False}
+    assert _project(DOC, {"_id"}) == {"_id": "team"}
+    assert _project(DOC, {"members": 0, "version": 0}) == {"_id": "team", "complete": False}
+    assert _project(DOC, {"members.0": 1}) is _UNSUPPORTED
+    assert _project(None, {"members": 1}) is None
+
+
+def test_merge_updates():
+    assert merge_updates({"$inc": {"version": 1}}, {"$inc": {"version": 1}}) == {"$inc": {"version": 2}}
+    assert merge_updates(
+        {"$set": {"complete": True}, "$push": {"members": "a"}},
+        {"$set": {"complete": False}, "$push": {"members": {"$each": ["b", "c"]}}},
+    ) == {"$set": {"complete": False}, "$push": {"members": {"$each": ["a", "b", "c"]}}}
+    assert merge_updates({"$set": {"desc": "x"}}, {"$inc": {"version": 1}}) == {
+        "$set": {"desc": "x"}, "$inc": {"version": 1},
+    }
+    # the same field through two operators, or an operator that doesn't combine
+    assert merge_updates({"$set": {"members": []}}, {"$push": {"members": "a"}}) is None
+    assert merge_updates({"$pull": {"members": "a"}}, {"$pull": {"members": "b"}}) is None
+    # a field and a path inside it through the same operator
+    assert merge_updates({"$set": {"a.b": 1}}, {"$set": {"a": {}}}) is None
+    assert merge_updates({"$inc": {"a": 1}}, {"$inc": {"a.b": 1}}) is None
+    assert merge_updates({"$set": {"a.b": 1}}, {"$set": {"a.c": 2}}) == {"$set": {"a.b": 1, "a.c": 2}}
+
+
+@pytest.fixture
+def flask_app(mongo_client):
+    app = Flask(__name__)
+    unit_of_work.init_app(app)
+    db.coll("teams").insert_one(dict(DOC))
+    return app
+
+
+def raw(coll_name):
+    db.coll(coll_name)
+    return db._collections[coll_name]
+
+
+def test_writes_drop_cached_documents(flask_app):
+    with flask_app.test_request_context():
+        teams = db.coll("teams")
+        assert teams.find_one({"_id": "team"}, {"complete": 1})["complete"] is False
+        teams.update_one({"_id": "team"}, {"$set": {"complete": True}})
+        assert teams.find_one({"_id": "team"})["complete"] is True
+        teams.update_many({"complete": True}, {"$push": {"members": "b"}})
+        assert teams.find_one({"_id": "team"}, {"members": 1})["members"] == ["a", "b"]
+
+
+def test_reads_flush_queued_updates(flask_app):
+    with flask_app.test_request_context():
+        db.bump_open_teams_version()
+        db.bump_open_teams_version()
+        assert raw("meta").find_one({"_id": "open_teams"}) is None
+        assert db.open_teams_version() == 2
+
+
+def test_queued_updates_are_written_when_the_request_ends(flask_app):
+    @flask_app.route("/bump")
+    def bump():
+        db.bump_open_teams_version()
+        unit_of_work.defer_update(db.coll("teams"), "team", {"$inc": {"version": 1}})
+        db.bump_open_teams_version()
+        assert raw("meta").find_one({"_id": "open_teams"}) is None
+        return "ok"
+
+    @flask_app.route("/fail")
+    def fail():
+        db.bump_open_teams_version()
+        raise RuntimeError("view failed")
+
+    flask_app.test_client().get("/bump")
+    assert raw("meta").find_one({"_id": "open_teams"})["version"] == 2
+    assert raw("teams").find_one({"_id": "team"})["version"] == 4
+    flask_app.config["PROPAGATE_EXCEPTIONS"] = False
+    assert flask_app.test_client().get("/fail").status_code == 500
+    assert raw("meta").find_one({"_id": "open_teams"})["version"] == 3
+
+
+def test_batch_threads_share_the_unit(flask_app, monkeypatch):
+    reads = []
+    teams = raw("teams")
+    find_one = teams.find_one
+    monkeypatch.setattr(teams, "find_one", lambda *args, **kwargs: reads.append(args) or find_one(*args, **kwargs))
+
+    def worker(unit):
+        unit_of_work.use(unit)
+        return db.coll("teams").find_one({"_id": "team"}, {"members": 1})["members"]
+
+    @flask_app.route("/batch")
+    def batch():
+        db.bump_open_teams_version()
+        unit = unit_of_work.current()
+        with ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(copy_current_request_context(worker), unit) for _ in range(4)]
+            assert [f.result() for f in futures] == [["a"]] * 4
+        # the workers' teardowns left the queued bump to this request
+        assert raw("meta").find_one({"_id": "open_teams"}) is None
+        return "ok"
+
+    assert flask_app.test_client().get("/batch").status_code == 200
+    assert len(reads) == 1
+    assert raw("meta").find_one({"_id": "open_teams"})["version"] == 1